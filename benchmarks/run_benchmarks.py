@@ -0,0 +1,347 @@
+"""
+End-to-end benchmarks for the fridge, shopping list and recipe flows.
+
+Every benchmark runs the real application functions on files in a temporary folder. The
+recipe flows run against the local stub servers (see stub_servers), with the recipe and
+weather caches turned off so every call goes through the API client. Interactive prompts
+are answered automatically and printed output is discarded.
+
+The results are printed as JSON. With --baseline the results are compared to an earlier
+run and the exit code is 1 when a benchmark got slower than the allowed tolerance.
+
+Run from the project root: python -m benchmarks.run_benchmarks --sizes 10,1000,100000
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import builtins
+import platform
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+QUICK_SIZES = [10, 1000]
+# Number of ingredients of the recipe that is added to the shopping list
+RECIPE_INGREDIENTS = 20
+# Number of recipes in the response used by the payload benchmark
+PAYLOAD_RECIPES = 100
+
+
+#------------------------------------------
+# Helper functions
+#------------------------------------------
+
+def configure_environment(folder, edamam_url, weather_url):
+    """Point the application at the temporary folder and the stub servers. Must run before the imports."""
+    os.environ.update({
+        'FRIDGE_FILE': os.path.join(folder, 'lists', 'fridge.csv'),
+        'SHOPPING_LIST_FILE': os.path.join(folder, 'lists', 'shopping_list.csv'),
+        'RECIPES_FOLDER': os.path.join(folder, 'recipes'),
+        'DATA_FOLDER': os.path.join(folder, 'data'),
+        'EDAMAM_BASE_URL': edamam_url,
+        'OPENWEATHER_BASE_URL': weather_url,
+        'EDAMAM_APP_ID': 'benchmark',
+        'EDAMAM_API_KEY': 'benchmark',
+        'OPENWEATHER_API_KEY': 'benchmark',
+        'PREFETCH_ENABLED': 'false',
+        'RECIPE_CACHE_TTL': '0',
+        'RANDOM_RECIPE_POOL_TTL': '0',
+        'WEATHER_CACHE_TTL': '0',
+        'HTTP_CASSETTE_MODE': 'off',
+        'EDAMAM_RATE_LIMIT': '0',
+    })
+    os.makedirs(os.path.join(folder, 'lists'))
+    os.makedirs(os.path.join(folder, 'recipes'))
+
+
+class AutoAnswer:
+    """Answers every input() prompt with the same text, so interactive functions can be timed."""
+
+    def __init__(self, answer):
+        self.answer = answer
+
+    def __enter__(self):
+        self._input = builtins.input
+        builtins.input = lambda prompt='': self.answer
+        return self
+
+    def __exit__(self, *exc_info):
+        builtins.input = self._input
+
+
+def fill_product_list(repository, names):
+    """Replace the contents of a product list with names, as a fresh snapshot without journal."""
+    from storage import write_rows_atomic
+
+    write_rows_atomic(repository.file_path, ['product_name'], [[name] for name in names])
+    if os.path.exists(repository.journal_path):
+        os.remove(repository.journal_path)
+
+
+def measure(name, size, function, iterations, answer='x'):
+    """Call function iterations times and return its timing statistics."""
+    durations = []
+    with AutoAnswer(answer), redirect_stdout(io.StringIO()):
+        for iteration in range(iterations):
+            start = time.perf_counter()
+            function(iteration)
+            durations.append(time.perf_counter() - start)
+
+    durations.sort()
+    total = sum(durations)
+    return {
+        'name': name,
+        'size': size,
+        'iterations': iterations,
+        'mean_us': round(total / iterations * 1e6, 1),
+        'p50_us': round(durations[len(durations) // 2] * 1e6, 1),
+        'p95_us': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1e6, 1),
+        'max_us': round(durations[-1] * 1e6, 1),
+        'operations_per_second': round(iterations / total, 1) if total else None,
+    }
+
+
+#------------------------------------------
+# Benchmarks
+#------------------------------------------
+
+def benchmark_fridge(sizes, iterations):
+    """get_fridge_contents, add_grocery_to_fridge and remove_product_from_fridge on fridges of every size."""
+    import fridge
+
+    results = []
+    for size in sizes:
+        fill_product_list(fridge.fridge_repository, [f"product {number}" for number in range(size)])
+        fridge.get_fridge_contents()  # Load the new snapshot, the first read is measured separately below
+
+        results.append(measure('get_fridge_contents', size, lambda i: fridge.get_fridge_contents(), iterations))
+        results.append(measure('add_grocery_to_fridge', size, lambda i: fridge.add_grocery_to_fridge(f"new product {i}"),
+                               iterations))
+        results.append(measure('remove_product_from_fridge', size,
+                               lambda i: fridge.remove_product_from_fridge(f"new product {i}"), iterations))
+
+        # Another process changed the file: the next read has to parse the whole snapshot
+        def read_after_change(i):
+            fill_product_list(fridge.fridge_repository, [f"product {number}" for number in range(size)])
+            fridge.get_fridge_contents()
+        results.append(measure('get_fridge_contents_after_external_change', size, read_after_change,
+                               max(1, iterations // 5)))
+    return results
+
+
+def benchmark_shopping_list(sizes, iterations):
+    """check_and_remove_products_in_fridge and add_recipe_ingredients_to_shopping_list at every list size."""
+    import fridge
+    import shopping_list
+
+    results = []
+    for size in sizes:
+        # Half of the shopping list is already in the fridge
+        fill_product_list(fridge.fridge_repository, [f"product {number}" for number in range(size)])
+        fill_product_list(shopping_list.shopping_list_repository,
+                          [f"product {number}" for number in range(size // 2, size + size // 2)])
+
+        # Answer 'nee', so the lists stay the same size for every iteration
+        results.append(measure('check_and_remove_products_in_fridge', size,
+                               lambda i: shopping_list.check_and_remove_products_in_fridge(), iterations, answer='nee'))
+
+        def add_ingredients(i):
+            ingredients = [f"product {number}" for number in range(0, size, max(1, size // RECIPE_INGREDIENTS))]
+            ingredients += [f"ingredient {i} {number}" for number in range(RECIPE_INGREDIENTS // 2)]
+            shopping_list.add_recipe_ingredients_to_shopping_list(ingredients)
+        results.append(measure('add_recipe_ingredients_to_shopping_list', size, add_ingredients, iterations))
+    return results
+
+
+def benchmark_next_file_number(sizes, iterations, folder):
+    """get_next_file_number with size recipe files in RECIPES_FOLDER, including the first call that imports them."""
+    import recipes
+    from recipe_store import RecipeStore
+
+    original_store = recipes.recipe_store
+    results = []
+    try:
+        for size in sizes:
+            recipe_folder = os.path.join(folder, f"recipes_{size}")
+            os.makedirs(recipe_folder)
+            for number in range(1, size + 1):
+                with open(os.path.join(recipe_folder, f"{number} - Recipe {number}.txt"), 'w') as file:
+                    file.write("Recept: benchmark\n")
+
+            stores = []
+
+            def first_call(i):
+                recipes.recipe_store = RecipeStore(os.path.join(recipe_folder, f"recipes_{i}.db"), recipe_folder)
+                stores.append(recipes.recipe_store)
+                recipes.get_next_file_number()
+            results.append(measure('get_next_file_number_first_call', size, first_call, max(1, iterations // 10)))
+            results.append(measure('get_next_file_number', size, lambda i: recipes.get_next_file_number(), iterations))
+    finally:
+        recipes.recipe_store = original_store
+    return results
+
+
+def benchmark_recipe_flows(iterations):
+    """The headless recipe flows (random, weather, fridge match and saving) against the stub servers."""
+    import fridge
+    import recipes
+    from commands import execute_command
+
+    fill_product_list(fridge.fridge_repository, ['egg', 'milk', 'flour', 'butter', 'sugar', 'tomato', 'onion'])
+
+    def run(command):
+        result = execute_command(command)
+        if not result['ok']:
+            raise RuntimeError(f"{command['op']} failed: {result['error']}")
+        return result['result']
+
+    recipe = run({'op': 'recipe.random', 'category': 'pasta'})['recipe']
+    return [
+        measure('recipe.random', None, lambda i: run({'op': 'recipe.random'}), iterations),
+        measure('recipe.weather', None, lambda i: run({'op': 'recipe.weather', 'city': f"City {i % 25}"}), iterations),
+        measure('recipe.fridge', None, lambda i: run({'op': 'recipe.fridge'}), iterations),
+        measure('save_recipe_to_file', None, lambda i: recipes.save_recipe_to_file(recipe), iterations),
+    ]
+
+
+def get_retained_bytes(function):
+    """Return the number of bytes still allocated for the result of function."""
+    tracemalloc.start()
+    try:
+        result = function()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def benchmark_recipe_payload(iterations):
+    """
+    Parse an Edamam response of PAYLOAD_RECIPES recipes: the full response into dicts
+    versus the response with only RECIPE_FIELDS into compact Recipe records.
+
+    Besides the timings, every result has the size of the response body and the memory
+    that the parsed recipes keep allocated.
+    """
+    from benchmarks.stub_servers import make_recipe, project_recipe
+    from recipe_record import Recipe, RECIPE_FIELDS
+
+    full_recipes = [make_recipe('pasta', number) for number in range(PAYLOAD_RECIPES)]
+    bodies = {
+        'full': json.dumps({'hits': [{'recipe': recipe} for recipe in full_recipes]}),
+        'projected': json.dumps({'hits': [{'recipe': project_recipe(recipe, RECIPE_FIELDS)}
+                                          for recipe in full_recipes]}),
+    }
+    parsers = {
+        'full': lambda: [hit['recipe'] for hit in json.loads(bodies['full'])['hits']],
+        'projected': lambda: [Recipe.from_dict(hit['recipe']) for hit in json.loads(bodies['projected'])['hits']],
+    }
+
+    results = []
+    for variant, parse in parsers.items():
+        result = measure(f"recipe_payload.{variant}", PAYLOAD_RECIPES, lambda i: parse(), iterations)
+        result['body_bytes'] = len(bodies[variant].encode('utf-8'))
+        result['retained_bytes'] = get_retained_bytes(parse)
+        results.append(result)
+    return results
+
+
+def benchmark_meal_planner(iterations):
+    """plan_meals() for a week on candidate pools of 1000 and 5000 recipes."""
+    from benchmarks.stub_servers import make_recipe
+    from meal_planner import plan_meals
+    from recipe_record import Recipe
+
+    fridge_ingredients = ['egg', 'milk', 'flour', 'butter', 'sugar', 'tomato', 'onion', 'garlic', 'rice', 'chicken']
+    results = []
+    for pool_size in (1000, 5000):
+        recipes = [Recipe.from_dict(make_recipe(query, number)) for number in range(pool_size // 5)
+                   for query in ('pasta', 'soup', 'chicken', 'salad', 'cake')]
+        results.append(measure('plan_meals', pool_size, lambda i: plan_meals(recipes, fridge_ingredients, 7),
+                               max(1, iterations // 10)))
+    return results
+
+
+def compare_to_baseline(results, baseline_results, tolerance):
+    """Return the benchmarks whose mean is more than tolerance slower than in the baseline."""
+    baseline = {(result['name'], result['size']): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['name'], result['size']))
+        if previous and result['mean_us'] > previous['mean_us'] * (1 + tolerance):
+            regressions.append({
+                'name': result['name'],
+                'size': result['size'],
+                'baseline_mean_us': previous['mean_us'],
+                'mean_us': result['mean_us'],
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fridge, shopping list and recipe flows.")
+    parser.add_argument('--sizes', help=f"Comma-separated list sizes (default {','.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument('--quick', action='store_true', help=f"Only use the sizes {','.join(map(str, QUICK_SIZES))}")
+    parser.add_argument('--iterations', type=int, default=50, help="Calls per benchmark")
+    parser.add_argument('--latency', type=float, default=0, help="Latency of the stub servers in milliseconds")
+    parser.add_argument('--skip-flows', action='store_true', help="Do not run the recipe flows")
+    parser.add_argument('--output', help="Also write the JSON results to this file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown compared to the baseline")
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    if args.sizes:
+        sizes = [int(size) for size in args.sizes.split(',')]
+
+    from benchmarks.stub_servers import start_stub_servers
+
+    edamam_server, weather_server = start_stub_servers(latency=args.latency / 1000)
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            configure_environment(folder, f"{edamam_server.base_url}/api/recipes/v2",
+                                  f"{weather_server.base_url}/data/2.5/weather")
+            from main import initialize
+            initialize(prefetch=False)
+
+            results = []
+            results += benchmark_fridge(sizes, args.iterations)
+            results += benchmark_shopping_list(sizes, args.iterations)
+            results += benchmark_next_file_number(sizes, args.iterations, folder)
+            results += benchmark_recipe_payload(args.iterations)
+            results += benchmark_meal_planner(args.iterations)
+            if not args.skip_flows:
+                results += benchmark_recipe_flows(args.iterations)
+    finally:
+        edamam_server.shutdown()
+        weather_server.shutdown()
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'stub_latency_ms': args.latency,
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['regressions'] = compare_to_baseline(results, json.load(file)['results'], args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+
+    sys.exit(1 if report.get('regressions') else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup benchmark: time from launching 'python main.py' until the first menu is rendered.
+
+Every run starts a fresh interpreter that chooses 'x' in the main menu, so the measured
+time is the startup plus rendering one menu and exiting. The run fails when the median
+is above the target, or when a network client was imported before the first menu.
+
+Run from the project root: python -m benchmarks.startup --runs 20 --target-ms 150
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+PROJECT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded before the first menu render
+LAZY_MODULES = ['requests', 'urllib3']
+
+# Imports what main.py imports and reports which of LAZY_MODULES got loaded
+CHECK_IMPORTS = f"""
+import sys, json
+sys.path.insert(0, {PROJECT_FOLDER!r})
+import main
+print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))
+"""
+
+
+def get_environment(folder):
+    """Return an environment that keeps the files of the runs in a temporary folder."""
+    return dict(
+        os.environ,
+        FRIDGE_FILE=os.path.join(folder, 'lists', 'fridge.csv'),
+        SHOPPING_LIST_FILE=os.path.join(folder, 'lists', 'shopping_list.csv'),
+        RECIPES_FOLDER=os.path.join(folder, 'recipes'),
+        DATA_FOLDER=os.path.join(folder, 'data'),
+        PREFETCH_ENABLED='false',
+    )
+
+
+def time_command(command, environment):
+    """Run a command that reads 'x' from stdin and return its wall time in seconds."""
+    start = time.perf_counter()
+    subprocess.run(command, input=b'x\n', env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup time of python main.py")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--target-ms', type=float, default=150, help="Maximum median startup time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        environment = get_environment(folder)
+        command = [sys.executable, os.path.join(PROJECT_FOLDER, 'main.py')]
+        time_command(command, environment)  # Creates the files, so every measured run does the same work
+        durations = sorted(time_command(command, environment) for _ in range(args.runs))
+        interpreter = min(time_command([sys.executable, '-c', 'pass'], environment) for _ in range(5))
+        loaded_modules = json.loads(subprocess.run([sys.executable, '-c', CHECK_IMPORTS], env=environment,
+                                                   capture_output=True, check=True, text=True).stdout)
+
+    median = statistics.median(durations)
+    result = {
+        'runs': args.runs,
+        'min_ms': round(durations[0] * 1000, 1),
+        'median_ms': round(median * 1000, 1),
+        'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 1),
+        'bare_interpreter_ms': round(interpreter * 1000, 1),
+        'target_ms': args.target_ms,
+        'eagerly_loaded_modules': loaded_modules,
+    }
+    result['passed'] = median * 1000 <= args.target_ms and not loaded_modules
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result['passed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Stress benchmark for the storage layer: N processes change the same product list at once.
+
+Every writer adds its own products one by one and removes every other one again. When
+writers are properly serialized no update is lost, so the final file must contain exactly
+the products that were added and not removed.
+
+Run from the project root: python -m benchmarks.storage_stress --writers 8 --operations 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_repository import ProductRepository
+from storage import write_rows_atomic, read_rows
+
+
+def run_writer(file_path, writer_id, operations):
+    """Add 'operations' products and remove every other one again."""
+    repository = ProductRepository(file_path)
+    for number in range(operations):
+        repository.add(f"writer{writer_id} product{number}")
+    for number in range(0, operations, 2):
+        repository.remove(f"writer{writer_id} product{number}")
+
+
+def run_stress_test(writers, operations):
+    """Run the writers in parallel and return the results as a dictionary."""
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = os.path.join(folder, 'products.csv')
+        write_rows_atomic(file_path, ['product_name'], [])
+
+        processes = [
+            multiprocessing.Process(target=run_writer, args=(file_path, writer_id, operations))
+            for writer_id in range(writers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        duration = time.perf_counter() - start
+
+        # Fold the journal into the CSV, so the file itself can be checked
+        ProductRepository(file_path).compact()
+        header, rows = read_rows(file_path)
+        found = {row[0] for row in rows}
+
+    expected = {
+        f"writer{writer_id} product{number}"
+        for writer_id in range(writers)
+        for number in range(1, operations, 2)
+    }
+    total_operations = writers * (operations + (operations + 1) // 2)
+    return {
+        'writers': writers,
+        'operations_per_writer': operations,
+        'duration_seconds': round(duration, 3),
+        'operations_per_second': round(total_operations / duration, 1),
+        'header_intact': header == ['product_name'],
+        'expected_products': len(expected),
+        'found_products': len(found),
+        'lost_updates': len(expected - found),
+        'unexpected_products': len(found - expected),
+        'duplicate_rows': len(rows) - len(found),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test concurrent writers on one product list.")
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=200)
+    args = parser.parse_args()
+
+    result = run_stress_test(args.writers, args.operations)
+    print(json.dumps(result, indent=2))
+
+    failed = result['lost_updates'] or result['unexpected_products'] or result['duplicate_rows'] or not result['header_intact']
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Local stand-ins for the Edamam recipe API (v2) and the OpenWeather current weather API.
+
+Both servers answer with the response shapes of the real APIs, generated from the query,
+so the same request always gets the same data. Latency and errors can be injected to see
+how the recipe flows behave under load. Random queries ('random=true') are drawn from a
+seeded generator, so a run with the same seed is reproducible.
+
+Run from the project root: python -m benchmarks.stub_servers --latency 50 --error-rate 0.05
+and point EDAMAM_BASE_URL and OPENWEATHER_BASE_URL at the printed addresses.
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+FOODS = [
+    'egg', 'milk', 'flour', 'butter', 'sugar', 'salt', 'pepper', 'onion', 'garlic', 'tomato', 'potato', 'carrot',
+    'chicken', 'beef', 'pork', 'rice', 'pasta', 'cheese', 'cream', 'lemon', 'apple', 'banana', 'strawberry',
+    'spinach', 'broccoli', 'mushroom', 'bell pepper', 'olive oil', 'basil', 'parsley', 'yogurt', 'honey',
+    'oats', 'bread', 'bacon', 'salmon', 'shrimp', 'tofu', 'lentil', 'chickpea', 'coconut milk', 'ginger',
+]
+MEAL_TYPES = ['breakfast', 'lunch/dinner', 'snack', 'teatime']
+DISH_TYPES = ['main course', 'soup', 'salad', 'desserts', 'drinks', 'starter', 'bread']
+CUISINE_TYPES = ['american', 'british', 'french', 'italian', 'mexican', 'asian', 'mediterranean', 'nordic']
+NUTRIENTS = ['ENERC_KCAL', 'FAT', 'FASAT', 'CHOCDF', 'FIBTG', 'SUGAR', 'PROCNT', 'CHOLE', 'NA', 'CA', 'MG', 'K', 'FE']
+WEATHER = [(800, 'Clear', 'clear sky'), (801, 'Clouds', 'few clouds'), (500, 'Rain', 'light rain'),
+           (600, 'Snow', 'light snow'), (741, 'Fog', 'fog')]
+
+# Number of recipes that exist for every query
+RECIPES_PER_QUERY = 200
+
+
+def get_seed(*parts):
+    """Return a stable integer seed for the given parts."""
+    return int.from_bytes(hashlib.sha1('|'.join(map(str, parts)).encode('utf-8')).digest()[:8], 'big')
+
+
+def make_recipe(query, number):
+    """Return the Edamam v2 recipe number of a query, including the large nutrient blocks."""
+    rng = random.Random(get_seed(query, number))
+    foods = rng.sample(FOODS, rng.randint(3, 12))
+    if query.split(',')[0].strip() not in foods:
+        foods[0] = query.split(',')[0].strip() or foods[0]
+    recipe_id = f"{get_seed(query, number):016x}"
+    nutrients = {
+        key: {'label': key, 'quantity': rng.uniform(0, 500), 'unit': 'g'} for key in NUTRIENTS
+    }
+    return {
+        'uri': f"http://www.edamam.com/ontologies/edamam.owl#recipe_{recipe_id}",
+        'label': f"{query.title()} recipe {number}",
+        'image': f"https://edamam-product-images.example/{recipe_id}.jpg",
+        'images': {size: {'url': f"https://edamam-product-images.example/{recipe_id}-{size}.jpg", 'width': width,
+                          'height': width} for size, width in (('THUMBNAIL', 100), ('SMALL', 200), ('REGULAR', 300))},
+        'source': rng.choice(['BBC Good Food', 'Food52', 'Serious Eats', 'Epicurious']),
+        'url': f"https://recipes.example/{recipe_id}",
+        'shareAs': f"http://www.edamam.com/recipe/{recipe_id}",
+        'yield': rng.randint(1, 8),
+        'dietLabels': ['Balanced'],
+        'healthLabels': ['Vegetarian', 'Peanut-Free', 'Tree-Nut-Free'],
+        'cautions': [],
+        'ingredientLines': [f"{rng.randint(1, 4)} {food}" for food in foods],
+        'ingredients': [
+            {'text': f"1 {food}", 'quantity': 1.0, 'measure': '<unit>', 'food': food, 'weight': rng.uniform(5, 300),
+             'foodCategory': 'Generic foods', 'foodId': f"food_{get_seed(food):012x}", 'image': None}
+            for food in foods
+        ],
+        'calories': rng.uniform(80, 2500),
+        'totalWeight': rng.uniform(100, 2000),
+        'totalTime': float(rng.choice([0, 15, 30, 45, 60])),
+        'cuisineType': [rng.choice(CUISINE_TYPES)],
+        'mealType': [rng.choice(MEAL_TYPES)],
+        'dishType': [rng.choice(DISH_TYPES)],
+        'totalNutrients': nutrients,
+        'totalDaily': nutrients,
+        'digest': [
+            {'label': key, 'tag': key, 'schemaOrgTag': None, 'total': value['quantity'], 'hasRDI': True,
+             'daily': value['quantity'] / 3, 'unit': 'g', 'sub': [
+                 {'label': f"{key} sub", 'tag': key, 'total': value['quantity'] / 2, 'unit': 'g'}]}
+            for key, value in nutrients.items()
+        ],
+    }
+
+
+def project_recipe(recipe, fields):
+    """Keep only the requested fields, like the 'field' parameter of the real API."""
+    return {key: value for key, value in recipe.items() if key in fields} if fields else recipe
+
+
+def make_weather(city):
+    """Return the OpenWeather current weather of a city, stable for the city name."""
+    rng = random.Random(get_seed(city.casefold()))
+    weather_id, main, description = rng.choice(WEATHER)
+    temperature = round(rng.uniform(-5, 32), 2)
+    return {
+        'coord': {'lon': round(rng.uniform(-180, 180), 4), 'lat': round(rng.uniform(-90, 90), 4)},
+        'weather': [{'id': weather_id, 'main': main, 'description': description, 'icon': '01d'}],
+        'base': 'stations',
+        'main': {'temp': temperature, 'feels_like': temperature - 1, 'temp_min': temperature - 2,
+                 'temp_max': temperature + 2, 'pressure': 1013, 'humidity': rng.randint(30, 95)},
+        'visibility': 10000,
+        'wind': {'speed': round(rng.uniform(0, 15), 2), 'deg': rng.randint(0, 359)},
+        'clouds': {'all': rng.randint(0, 100)},
+        'dt': int(time.time()),
+        'sys': {'country': 'NL', 'sunrise': 0, 'sunset': 0},
+        'timezone': 3600,
+        'id': get_seed(city.casefold()) % 10000000,
+        'name': city,
+        'cod': 200,
+    }
+
+
+class StubSettings:
+    """Latency and error injection settings, shared by the handlers of one server."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_statuses=(429, 500, 503), seed=0):
+        self.latency = latency  # Seconds
+        self.jitter = jitter  # Seconds
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        """Count a request and return (delay, error status or None) for it."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            status = None
+            if self.error_rate and self._random.random() < self.error_rate:
+                status = self._random.choice(self.error_statuses)
+                self.errors += 1
+            return delay, status
+
+    def random_numbers(self, count):
+        """Return count distinct recipe numbers for a random query."""
+        with self._lock:
+            return self._random.sample(range(RECIPES_PER_QUERY), min(count, RECIPES_PER_QUERY))
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without this every response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        settings = self.server.settings
+        delay, error_status = settings.next_request()
+        if delay:
+            time.sleep(delay)
+        if error_status is not None:
+            headers = {'Retry-After': '1'} if error_status == 429 else {}
+            self.send_json(error_status, {'status': 'error', 'message': 'Injected error'}, headers)
+            return
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        status, data = self.server.answer(url.path, query)
+        self.send_json(status, data)
+
+    def send_json(self, status, data, headers=None):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, settings):
+        super().__init__(address, StubRequestHandler)
+        self.settings = settings
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def answer(self, path, query):
+        raise NotImplementedError
+
+
+class EdamamStubServer(StubServer):
+    """Answers GET /api/recipes/v2 like Edamam v2: from/to paging, 'random' and 'field' projection."""
+
+    def answer(self, path, query):
+        q = query.get('q', [''])[0].strip().lower()
+        start = int(query.get('from', ['0'])[0])
+        end = int(query.get('to', [str(start + 20)])[0])
+        end = min(max(end, start), RECIPES_PER_QUERY)
+        fields = set(query.get('field', []))
+
+        if query.get('random', ['false'])[0].lower() == 'true':
+            numbers = self.settings.random_numbers(min(end - start, 20) if end > start else 20)
+        else:
+            numbers = range(start, min(end, start + 20))
+
+        hits = [
+            {'recipe': project_recipe(make_recipe(q, number), fields),
+             '_links': {'self': {'href': f"{self.base_url}/api/recipes/v2/{number}", 'title': 'Self'}}}
+            for number in numbers
+        ]
+        return 200, {
+            'from': start,
+            'to': start + len(hits),
+            'count': RECIPES_PER_QUERY,
+            '_links': {'next': {'href': f"{self.base_url}{path}?q={q}&from={start + len(hits)}", 'title': 'Next page'}},
+            'hits': hits,
+        }
+
+
+class WeatherStubServer(StubServer):
+    """Answers GET /data/2.5/weather like OpenWeather, '404' for an empty city name."""
+
+    def answer(self, path, query):
+        city = query.get('q', [''])[0].strip()
+        if not city:
+            return 404, {'cod': '404', 'message': 'city not found'}
+        return 200, make_weather(city)
+
+
+def start_stub_servers(host='127.0.0.1', edamam_port=0, weather_port=0, **settings):
+    """
+    Start both stub servers in background threads and return (edamam_server, weather_server).
+
+    Port 0 picks a free port. The keyword arguments are passed to StubSettings, every server
+    gets its own settings. Call shutdown() on the servers to stop them.
+    """
+    servers = (EdamamStubServer((host, edamam_port), StubSettings(**settings)),
+               WeatherStubServer((host, weather_port), StubSettings(**settings)))
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub servers for Edamam and OpenWeather")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--edamam-port", type=int, default=8701)
+    parser.add_argument("--weather-port", type=int, default=8702)
+    parser.add_argument("--latency", type=float, default=0, help="Added latency per request in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0, help="Random latency variation in milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests that get an error status")
+    parser.add_argument("--error-statuses", default="429,500,503", help="Comma-separated injected status codes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for random queries, latency and errors")
+    arguments = parser.parse_args()
+
+    edamam_server, weather_server = start_stub_servers(
+        arguments.host, arguments.edamam_port, arguments.weather_port,
+        latency=arguments.latency / 1000, jitter=arguments.jitter / 1000, error_rate=arguments.error_rate,
+        error_statuses=[int(status) for status in arguments.error_statuses.split(',')], seed=arguments.seed
+    )
+    print(f"EDAMAM_BASE_URL={edamam_server.base_url}/api/recipes/v2")
+    print(f"OPENWEATHER_BASE_URL={weather_server.base_url}/data/2.5/weather")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        edamam_server.shutdown()
+        weather_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from http_client import RequestError
+from edamam_api import get_recipe_page
+from open_weather_api import WEATHER_RECIPE_TYPES, get_recipe_types_for_cities
+from recipe_index import recipe_index
+from recipes import RANDOM_RECIPE_CATEGORIES
+
+# Warm-up settings
+WARM_UP_RECIPES = config.get_int("WARM_UP_RECIPES", 40)  # Recipes fetched per category
+WARM_UP_PAGE_SIZE = config.get_int("WARM_UP_PAGE_SIZE", 20)  # Recipes per request
+WARM_UP_WORKERS = config.get_int("WARM_UP_WORKERS", 4)  # Page requests waiting at the same time
+
+
+def get_warm_up_categories():
+    """Return the categories of the random recipes followed by the recipe types of the weather flow."""
+    return RANDOM_RECIPE_CATEGORIES + [recipe_type for recipe_type in WEATHER_RECIPE_TYPES
+                                       if recipe_type not in RANDOM_RECIPE_CATEGORIES]
+
+
+def warm_up(recipes_per_category=WARM_UP_RECIPES, categories=None, cities=(), page_size=WARM_UP_PAGE_SIZE,
+            max_workers=WARM_UP_WORKERS):
+    """
+    Fetch and store recipes_per_category recipes for every category, for use in offline mode.
+
+    Every category is split in pages of page_size recipes, and all pages are requested in
+    parallel, bypassing the recipe pools. The requests go through the Edamam scheduler
+    with prefetch priority, so the warm-up stays within the quota. The weather of the
+    given cities is looked up as well, so the weather flow works offline for them.
+
+    Returns the number of stored recipes per category, the number of failed pages and the
+    recipe type per city (None when its weather could not be fetched).
+    """
+    categories = get_warm_up_categories() if categories is None else categories
+    pages = [(category, start, min(page_size, recipes_per_category - start))
+             for category in categories for start in range(0, recipes_per_category, page_size)]
+
+    failed_pages = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(get_recipe_page, category, start, count, fresh=True)
+                   for category, start, count in pages]
+        for future in futures:
+            try:
+                future.result()
+            except RequestError:
+                failed_pages += 1
+
+    return {
+        'recipes': {category: recipe_index.count_for_query(category) for category in categories},
+        'failed_pages': failed_pages,
+        'cities': {city: recipe_type for city, (_, recipe_type) in get_recipe_types_for_cities(cities).items()},
+    }
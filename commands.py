@@ -0,0 +1,244 @@
+import json
+import random
+import sys
+import threading
+from contextlib import redirect_stdout
+
+from fridge import fridge_repository
+from shopping_list import shopping_list_repository
+from metrics import metrics
+from http_client import RequestError
+from seen_recipes import seen_recipes
+from ingredient_matching import find_missing_ingredients, find_common_ingredients
+from recipes import (RANDOM_RECIPE_CATEGORIES, BEST_MATCH_TOP_K, get_recipe_for_category, get_recipe_ingredients,
+                     find_best_recipes_for_fridge, get_weather_with_speculative_recipes, create_meal_plan)
+from meal_planner import MEAL_PLAN_MEALS
+from cache_warmup import WARM_UP_RECIPES, warm_up
+
+
+class CommandError(Exception):
+    """Raised for a command that cannot be executed (unknown operation, missing argument)."""
+
+
+class Household:
+    """The fridge, shopping list and record of shown recipes that commands work on."""
+
+    def __init__(self, fridge, shopping_list, seen_recipes):
+        self.fridge = fridge
+        self.shopping_list = shopping_list
+        self.seen_recipes = seen_recipes
+        # Serializes the commands of this household when several threads serve it (see server)
+        self.lock = threading.Lock()
+
+
+# Household of the files configured in .env
+default_household = Household(fridge_repository, shopping_list_repository, seen_recipes)
+
+
+#------------------------------------------
+# Helper functions
+#------------------------------------------
+
+def get_names(command, key='products'):
+    """Return the list of names of a command, which may also give a single name (e.g. 'product')."""
+    names = command.get(key)
+    if names is None and key.endswith('s'):
+        single = command.get(key[:-1])
+        names = [single] if single is not None else None
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise CommandError(f"'{key}' moet een lijst met namen zijn.")
+    return names
+
+
+def summarize_recipe(recipe):
+    """Return the fields of a recipe that are shown or saved by FridgeChef."""
+    if recipe is None:
+        return None
+    return {
+        'label': recipe['label'],
+        'source': recipe.get('source'),
+        'url': recipe.get('url'),
+        'mealType': recipe.get('mealType', []),
+        'dishType': recipe.get('dishType', []),
+        'cuisineType': recipe.get('cuisineType', []),
+        'calories': recipe.get('calories'),
+        'ingredientLines': recipe.get('ingredientLines', []),
+        'ingredients': get_recipe_ingredients(recipe),
+    }
+
+
+#------------------------------------------
+# Commands
+#------------------------------------------
+
+def list_products(repository, command):
+    return {'products': repository.get_products()}
+
+
+def add_products(repository, command):
+    return {'added': repository.add_many(get_names(command))}
+
+
+def remove_products(repository, command):
+    return {'removed': repository.remove_many(get_names(command))}
+
+
+def clear_products(repository, command):
+    repository.clear()
+    return {}
+
+
+def add_recipe_ingredients(household, command):
+    """Add the ingredients that are not in the fridge to the shopping list."""
+    missing = find_missing_ingredients(get_names(command, 'ingredients'), household.fridge.get_product_set())
+    return {'missing': missing, 'added': household.shopping_list.add_many(missing)}
+
+
+def remove_fridge_products_from_shopping_list(household, command):
+    """Remove the products that are already in the fridge from the shopping list."""
+    in_fridge = find_common_ingredients(household.shopping_list.get_products(), household.fridge.get_product_set())
+    return {'removed': household.shopping_list.remove_many(in_fridge)}
+
+
+def get_recipe_summary(category, household):
+    """Return the summary of a recipe for the category (None when none was found)."""
+    try:
+        return summarize_recipe(get_recipe_for_category(category, household.seen_recipes))
+    except RequestError as e:
+        raise CommandError(f"Er is iets mis gegaan tijdens het ophalen van de recepten: {e}") from e
+
+
+def random_recipe(household, command):
+    category = command.get('category') or random.choice(RANDOM_RECIPE_CATEGORIES)
+    return {'category': category, 'recipe': get_recipe_summary(category, household)}
+
+
+def weather_recipe(household, command):
+    city = command.get('city')
+    if not isinstance(city, str) or not city.strip():
+        raise CommandError("'city' ontbreekt.")
+
+    weather_data, recipe_type = get_weather_with_speculative_recipes(city)
+    if weather_data is None:
+        raise CommandError(f"Geen weerdata gevonden voor '{city}'.")
+    return {
+        'city': city,
+        'temperature': weather_data['main']['temp'],
+        'weather': weather_data['weather'][0]['description'],
+        'recipe_type': recipe_type,
+        'recipe': get_recipe_summary(recipe_type, household),
+    }
+
+
+def fridge_recipes(household, command):
+    """Return the best matching recipes for the fridge, with their coverage and missing ingredients."""
+    top_k = command.get('top_k', BEST_MATCH_TOP_K)
+    if not isinstance(top_k, int) or top_k < 1:
+        raise CommandError("'top_k' moet een positief geheel getal zijn.")
+    fridge_ingredients = household.fridge.get_products()
+    if not fridge_ingredients:
+        return {'matches': []}
+    matches = find_best_recipes_for_fridge(fridge_ingredients, top_k)
+    return {'matches': [
+        {'recipe': summarize_recipe(recipe), 'coverage': round(coverage, 3), 'missing': missing}
+        for recipe, coverage, missing in matches
+    ]}
+
+
+def meal_plan(household, command):
+    """Plan 'meals' meals for the fridge; with 'add_to_shopping_list' the missing ingredients are added in one write."""
+    meal_count = command.get('meals', MEAL_PLAN_MEALS)
+    if not isinstance(meal_count, int) or meal_count < 1:
+        raise CommandError("'meals' moet een positief geheel getal zijn.")
+
+    plan = create_meal_plan(household.fridge.get_products(), meal_count)
+    result = plan.to_dict()
+    if command.get('add_to_shopping_list'):
+        result['added'] = household.shopping_list.add_many(plan.missing_ingredients)
+    return result
+
+
+def warm_up_cache(household, command):
+    """Fetch and store recipes per category (and the weather of 'cities') for offline use."""
+    recipes_per_category = command.get('recipes_per_category', WARM_UP_RECIPES)
+    if not isinstance(recipes_per_category, int) or recipes_per_category < 1:
+        raise CommandError("'recipes_per_category' moet een positief geheel getal zijn.")
+    return warm_up(recipes_per_category, command.get('categories'), command.get('cities', []))
+
+
+# Operation name -> function(household, command)
+COMMANDS = {
+    'fridge.list': lambda household, command: list_products(household.fridge, command),
+    'fridge.add': lambda household, command: add_products(household.fridge, command),
+    'fridge.remove': lambda household, command: remove_products(household.fridge, command),
+    'fridge.clear': lambda household, command: clear_products(household.fridge, command),
+    'shopping_list.list': lambda household, command: list_products(household.shopping_list, command),
+    'shopping_list.add': lambda household, command: add_products(household.shopping_list, command),
+    'shopping_list.remove': lambda household, command: remove_products(household.shopping_list, command),
+    'shopping_list.clear': lambda household, command: clear_products(household.shopping_list, command),
+    'shopping_list.add_recipe_ingredients': add_recipe_ingredients,
+    'shopping_list.remove_fridge_products': remove_fridge_products_from_shopping_list,
+    'recipe.random': random_recipe,
+    'recipe.weather': weather_recipe,
+    'recipe.fridge': fridge_recipes,
+    'recipe.seen_stats': lambda household, command: household.seen_recipes.get_stats(),
+    'meal_plan.create': meal_plan,
+    'cache.warm_up': warm_up_cache,
+}
+
+
+def execute_command(command, household=default_household):
+    """
+    Execute one command and return its result as a dictionary.
+
+    A command is a dictionary with an 'op' (see COMMANDS) and its arguments, plus an
+    optional 'id' that is copied to the result. Errors never raise: the result then has
+    'ok': false and an 'error' message.
+    """
+    if not isinstance(command, dict):
+        return {'id': None, 'op': None, 'ok': False, 'error': "Een opdracht moet een JSON object zijn."}
+
+    result = {'id': command.get('id'), 'op': command.get('op'), 'ok': False}
+    try:
+        operation = COMMANDS.get(command.get('op'))
+        if operation is None:
+            raise CommandError(f"Onbekende opdracht '{command.get('op')}'.")
+        with metrics.span('command_seconds', op=command['op']):
+            result['result'] = operation(household, command)
+        result['ok'] = True
+    except CommandError as e:
+        result['error'] = str(e)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+#------------------------------------------
+# Batch mode
+#------------------------------------------
+
+def run_batch(input_file, output_file, household=default_household):
+    """
+    Run the JSONL commands of input_file and write one JSONL result per command to output_file.
+
+    Commands are streamed one line at a time, nothing prompts the user. Messages that
+    the underlying functions print go to stderr, so output_file only contains results.
+    Returns the number of failed commands.
+    """
+    failures = 0
+    with redirect_stdout(sys.stderr):
+        for line_number, line in enumerate(input_file, start=1):
+            if not line.strip():
+                continue
+            try:
+                command = json.loads(line)
+            except ValueError as e:
+                result = {'id': None, 'op': None, 'ok': False, 'error': f"Ongeldige JSON op regel {line_number}: {e}"}
+            else:
+                result = execute_command(command, household)
+
+            if not result['ok']:
+                failures += 1
+            output_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+    output_file.flush()
+    return failures
@@ -0,0 +1,67 @@
+import os
+import threading
+
+# Settings without which FridgeChef cannot start
+REQUIRED_KEYS = ['FRIDGE_FILE', 'SHOPPING_LIST_FILE', 'RECIPES_FOLDER']
+# Settings the recipe and weather features need
+API_KEYS = ['EDAMAM_APP_ID', 'EDAMAM_API_KEY', 'EDAMAM_BASE_URL', 'OPENWEATHER_API_KEY', 'OPENWEATHER_BASE_URL']
+
+
+class ConfigError(Exception):
+    """Raised when required settings are missing."""
+
+
+class Config:
+    """
+    Settings of FridgeChef, read from the environment and the .env file.
+
+    The .env file is parsed once, on the first lookup, instead of by every module that
+    needs a setting. Variables that are already set in the environment take precedence
+    over the .env file.
+    """
+
+    def __init__(self):
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Parse the .env file, only the first time this is called."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    from dotenv import load_dotenv
+                    load_dotenv()
+                    self._loaded = True
+
+    def get(self, key, default=None):
+        """Return a setting as text, or default when it is not set."""
+        self.load()
+        return os.environ.get(key, default)
+
+    def get_int(self, key, default):
+        return int(self.get(key, default))
+
+    def get_float(self, key, default):
+        return float(self.get(key, default))
+
+    def get_bool(self, key, default):
+        """Return a setting that is 'true' or 'false'."""
+        value = self.get(key)
+        return default if value is None else value.lower() == 'true'
+
+    def get_missing(self, keys):
+        """Return the keys of settings that are not set or empty."""
+        return [key for key in keys if not self.get(key)]
+
+    def validate(self, keys=REQUIRED_KEYS):
+        """Raise ConfigError naming every missing setting of keys."""
+        missing = self.get_missing(keys)
+        if missing:
+            raise ConfigError(f"Ontbrekende instellingen in .env: {', '.join(missing)}")
+
+
+# Shared configuration for the whole application
+config = Config()
+
+# Folder of the caches, indexes and other files FridgeChef keeps next to the product lists
+DATA_FOLDER = config.get("DATA_FOLDER", "data")
@@ -1,46 +1,187 @@
-import os
 import random
+from concurrent.futures import Future
 
-import requests
-from dotenv import load_dotenv
-
-load_dotenv()
+from config import config
+import http_client
+from recipe_cache import recipe_cache, make_cache_key, make_pool_key, RANDOM_RECIPE_POOL_TTL, RANDOM_RECIPE_POOL_SIZE
+from recipe_index import recipe_index
+from recipe_record import Recipe, RECIPE_FIELDS
+from request_scheduler import edamam_scheduler, INTERACTIVE, PREFETCH
+from offline import is_offline, is_network_error
 
 # Edamam API credentials and Base URL
-APP_ID = os.getenv("EDAMAM_APP_ID")
-APP_KEY = os.getenv("EDAMAM_API_KEY")
-BASE_URL = os.getenv("EDAMAM_BASE_URL")
+APP_ID = config.get("EDAMAM_APP_ID")
+APP_KEY = config.get("EDAMAM_API_KEY")
+BASE_URL = config.get("EDAMAM_BASE_URL")
 
+# Number of candidate recipes fetched at once for the "best match" mode
+BEST_MATCH_CANDIDATES = config.get_int("BEST_MATCH_CANDIDATES", 50)
 
-def get_random_recipe(query):
-    """Fetch a random recipe using Edamam API v2"""
+# Where the recipes of fetch_recipes_with_source() came from
+FROM_CACHE = 'cache'
+FROM_EDAMAM = 'edamam'
+FROM_LOCAL = 'local'
 
-    # List of possible search queries to vary the results because there is no random option in the API without using a query
-    random_query = random.choice(query)
 
-    # Recipe query parameters (adapted for Edamam v2)
-    params = {
-        'type': 'public',  # Required in v2, specify recipe type
+def fetch_recipes(params, priority=INTERACTIVE, fresh=False):
+    """Return the recipes for the given query parameters (see fetch_recipes_with_source())."""
+    return fetch_recipes_with_source(params, priority, fresh)[0]
+
+
+def fetch_recipes_with_source(params, priority=INTERACTIVE, fresh=False):
+    """
+    Return (recipes, source) for the given query parameters, from the cache when possible.
+
+    source tells where the recipes came from: FROM_CACHE (the cache or the pool of a
+    random query), FROM_EDAMAM (a request was sent) or FROM_LOCAL (the local corpus).
+
+    Only the fields in RECIPE_FIELDS are requested, which leaves out the nutrient, digest
+    and image blocks that make up most of an Edamam response. The recipes are returned as
+    compact Recipe records.
+
+    Random queries are not cached like the other queries, that would return the same
+    "random" recipes for a whole day. At least RANDOM_RECIPE_POOL_SIZE recipes are
+    requested for them instead, and the requested number is sampled from that pool until
+    it is older than RANDOM_RECIPE_POOL_TTL. fresh=True skips the cache and the pool.
+
+    Requests go through the Edamam scheduler, which keeps them within the quota, sends
+    interactive requests before prefetches and lets concurrent identical queries share
+    one request.
+
+    In offline mode, and when the network cannot be reached, the recipes come from the
+    local corpus instead (see get_local_recipes()).
+    """
+    params = dict(params, field=list(RECIPE_FIELDS))
+    if not fresh:
+        recipes = _get_stored_recipes(params)
+        if recipes is not None:
+            return recipes, FROM_CACHE
+
+    if is_offline():
+        return get_local_recipes(params), FROM_LOCAL
+
+    try:
+        recipes = edamam_scheduler.submit(*_prepare_request(params), priority)
+    except http_client.RequestError as e:
+        local_recipes = get_local_recipes(params) if is_network_error(e) else []
+        if not local_recipes:
+            raise
+        return local_recipes, FROM_LOCAL
+
+    if params.get('random'):
+        recipes = random.sample(recipes, min(_get_count(params), len(recipes)))
+    return recipes, FROM_EDAMAM
+
+
+def _get_count(params):
+    """Return the number of recipes the query parameters ask for."""
+    return max(1, params.get('to', 20) - params.get('from', 0))
+
+
+def _get_stored_recipes(params):
+    """Return the cached recipes of a query (a sample of the pool for a random query), or None."""
+    if not params.get('random'):
+        cached = recipe_cache.get(make_cache_key(params))
+        return None if cached is None else [Recipe.from_dict(recipe) for recipe in cached]
+
+    count = _get_count(params)
+    pool = recipe_cache.get(make_pool_key(params), RANDOM_RECIPE_POOL_TTL)
+    if pool is None or len(pool) < count:
+        return None
+    return [Recipe.from_dict(recipe) for recipe in random.sample(pool, count)]
+
+
+def _prepare_request(params):
+    """Return the scheduler key and the function of the Edamam request for a query (a whole pool when random)."""
+    if params.get('random'):
+        request_params = dict(params, to=params.get('from', 0) + max(_get_count(params), RANDOM_RECIPE_POOL_SIZE))
+        store_key = make_pool_key(params)
+    else:
+        request_params = params
+        store_key = make_cache_key(params)
+    return make_cache_key(request_params), lambda: request_recipes(request_params, store_key)
+
+
+def request_recipes(params, cache_key):
+    """Request the recipes from Edamam and store them in the cache (or pool) and the local corpus."""
+    data = http_client.get_json(BASE_URL, params=params, api='edamam')
+    recipes = [Recipe.from_dict(hit['recipe']) for hit in data.get('hits', [])]
+    # Only store answers that contain recipes, an empty result is worth retrying later
+    if recipes:
+        recipe_cache.set(cache_key, [recipe.to_dict() for recipe in recipes])
+        # Keep every received recipe in the local corpus for offline use
+        recipe_index.add_recipes(recipes, params.get('q'))
+
+    return recipes
+
+
+def get_local_recipes(params):
+    """
+    Answer a query from the local corpus, without using the network.
+
+    Returns the stored recipes that Edamam returned for the same query before. For a
+    query that was never sent (e.g. a combination of fridge ingredients) the recipes
+    that best match the query terms as ingredients are returned instead.
+    """
+    query = params.get('q', '')
+    count = _get_count(params)
+    recipes = recipe_index.get_recipes_for_query(query, count)
+    if not recipes:
+        terms = [term.strip() for term in query.split(',') if term.strip()]
+        recipes = [recipe for recipe, _, _ in recipe_index.find_recipes_for_fridge(terms, count)]
+    return recipes
+
+
+def _get_page_params(query, start, count):
+    """Return the query parameters of a page of random recipes for a single query."""
+    return {
+        'type': 'public',
         'app_id': APP_ID,
         'app_key': APP_KEY,
-        'q': random_query,
-        'random': True,  # Enable random recipe fetching
-        'to': 1  # Fetch only one random recipe
+        'q': query,
+        'random': True,
+        'from': start,
+        'to': start + count
     }
 
-    try:
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()  # Will raise HTTPError for bad responses
-        data = response.json()
-        recipe = data['hits'][0]['recipe'] if data.get('hits') else None
-        if recipe:
-            return recipe
-        else:
-            print("Geen recepten gevonden.")
-            return None
-    except requests.exceptions.RequestException as e:
-        print(f"Er is iets mis gegaan tijdens het ophalen van de recepten: {e}")
-        return None
+
+def get_recipe_page(query, start=0, count=20, priority=PREFETCH, fresh=False):
+    """
+    Fetch a page of random recipes for a single query in one request.
+
+    Unlike the other functions errors are not handled here, so background callers
+    (e.g. the prefetcher) can decide for themselves how to deal with them. The request
+    has prefetch priority unless another priority is given. fresh=True always requests
+    new recipes instead of sampling the pool of the query (see fetch_recipes()).
+    """
+    return fetch_recipes(_get_page_params(query, start, count), priority, fresh)
+
+
+def get_recipe_page_with_source(query, start=0, count=20, priority=PREFETCH, fresh=False):
+    """Like get_recipe_page(), but return (recipes, source) (see fetch_recipes_with_source())."""
+    return fetch_recipes_with_source(_get_page_params(query, start, count), priority, fresh)
+
+
+def schedule_recipe_page(query, start=0, count=20):
+    """
+    Queue the request of a page of random recipes with prefetch priority, without waiting for it.
+
+    Returns a future with the recipes (the whole pool of the query when it had to be
+    requested). The future is already done when the page could be answered from the pool
+    or from the local corpus. edamam_scheduler.cancel(future) drops the request as long
+    as it was not sent, and edamam_scheduler.promote(future) moves it up once a user
+    waits for it.
+    """
+    params = dict(_get_page_params(query, start, count), field=list(RECIPE_FIELDS))
+    recipes = _get_stored_recipes(params)
+    if recipes is None and is_offline():
+        recipes = get_local_recipes(params)
+    if recipes is None:
+        return edamam_scheduler.schedule(*_prepare_request(params), PREFETCH)
+
+    future = Future()
+    future.set_result(recipes)
+    return future
 
 
 def get_recipe_based_on_fridge(ingredients):
@@ -59,15 +200,38 @@ def get_recipe_based_on_fridge(ingredients):
     }
 
     try:
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()  # Will raise HTTPError for bad responses
-        data = response.json()
-        recipe = data['hits'][0]['recipe'] if data.get('hits') else None
+        recipes = fetch_recipes(params)
+        recipe = random.choice(recipes) if recipes else None
         if recipe:
             return recipe
         else:
             print("Geen recepten gevonden.")
             return None
-    except requests.exceptions.RequestException as e:
+    except http_client.RequestError as e:
         print(f"Er is iets mis gegaan tijdens het ophalen van de recepten: {e}")
         return None
+
+
+def get_recipes_based_on_fridge(ingredients, count=BEST_MATCH_CANDIDATES):
+    """Fetch a page of candidate recipes for the fridge contents in a single request."""
+
+    # Same query as get_recipe_based_on_fridge, but the whole page is returned for ranking
+    key_ingredients = random.sample(ingredients, min(len(ingredients), 3))
+
+    params = {
+        'type': 'public',
+        'app_id': APP_ID,
+        'app_key': APP_KEY,
+        'q': ','.join(key_ingredients),
+        'random': True,
+        'to': count
+    }
+
+    try:
+        recipes = fetch_recipes(params)
+        if not recipes:
+            print("Geen recepten gevonden.")
+        return recipes
+    except http_client.RequestError as e:
+        print(f"Er is iets mis gegaan tijdens het ophalen van de recepten: {e}")
+        return []
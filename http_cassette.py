@@ -0,0 +1,126 @@
+import os
+import json
+import threading
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from config import config, DATA_FOLDER
+
+# 'record' stores every API response in the cassette, 'replay' answers every request from it
+HTTP_CASSETTE_MODE = config.get("HTTP_CASSETTE_MODE", "off").lower()
+HTTP_CASSETTE_FILE = config.get("HTTP_CASSETTE_FILE", os.path.join(DATA_FOLDER, "http_cassette.jsonl"))
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# Credentials are never written to a cassette and are not part of the request key
+SECRET_PARAMS = {'app_id', 'app_key', 'appid'}
+# Response headers that are kept, the rest is not used by the clients
+KEPT_HEADERS = {'content-type', 'retry-after'}
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode for a request that is not in the cassette."""
+
+
+def make_request_key(url, params=None):
+    """Return the key of a request: the url plus its sorted parameters without credentials."""
+    items = sorted((str(key), str(value)) for key, value in (params or {}).items() if key not in SECRET_PARAMS)
+    return f"{url}?{urlencode(items)}" if items else url
+
+
+class CassetteResponse:
+    """The part of requests.Response that the API clients use, rebuilt from a recorded response."""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class Cassette:
+    """
+    Recorded API responses in a JSONL file, one {key, status, headers, body} object per line.
+
+    In record mode every response is appended to the file. In replay mode the responses
+    of a request key are returned in the order they were recorded, starting over after the
+    last one, so a replayed session is deterministic even for queries with 'random': true.
+    """
+
+    def __init__(self, file_path, mode):
+        self.file_path = file_path
+        self.mode = mode
+        self._entries = None  # Request key -> list of recorded responses
+        self._positions = defaultdict(int)  # Request key -> index of the next response to replay
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Read the cassette file once. Lock must be held."""
+        if self._entries is None:
+            self._entries = defaultdict(list)
+            if os.path.exists(self.file_path):
+                with open(self.file_path, encoding='utf-8') as file:
+                    for line in file:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry['key']].append(entry)
+        return self._entries
+
+    def record(self, url, params, response):
+        """Append a response to the cassette."""
+        entry = {
+            'key': make_request_key(url, params),
+            'status': response.status_code,
+            'headers': {key: value for key, value in response.headers.items() if key.lower() in KEPT_HEADERS},
+            'body': response.content.decode('utf-8'),
+        }
+        with self._lock:
+            self._load()[entry['key']].append(entry)
+            folder = os.path.dirname(self.file_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(self.file_path, mode='a', encoding='utf-8') as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def replay(self, url, params):
+        """Return the next recorded response for a request, or raise CassetteMissError."""
+        key = make_request_key(url, params)
+        with self._lock:
+            entries = self._load().get(key)
+            if not entries:
+                raise CassetteMissError(f"Geen opgenomen antwoord voor {key}")
+            entry = entries[self._positions[key] % len(entries)]
+            self._positions[key] += 1
+        return CassetteResponse(url, entry['status'], entry['headers'], entry['body'].encode('utf-8'))
+
+    def count(self):
+        """Return the number of recorded responses."""
+        with self._lock:
+            return sum(len(entries) for entries in self._load().values())
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """Return the cassette configured by HTTP_CASSETTE_MODE, or None when recording and replaying are off."""
+    global _cassette
+    if HTTP_CASSETTE_MODE not in (RECORD, REPLAY):
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(HTTP_CASSETTE_FILE, HTTP_CASSETTE_MODE)
+    return _cassette
@@ -0,0 +1,141 @@
+import random
+import threading
+import time
+
+from config import config
+from http_cassette import REPLAY, CassetteMissError, get_cassette
+from metrics import metrics
+
+# Transport settings shared by the Edamam and OpenWeather clients
+HTTP_CONNECT_TIMEOUT = config.get_float("HTTP_CONNECT_TIMEOUT", 3.05)  # Seconds
+HTTP_READ_TIMEOUT = config.get_float("HTTP_READ_TIMEOUT", 10)  # Seconds
+HTTP_MAX_RETRIES = config.get_int("HTTP_MAX_RETRIES", 3)
+HTTP_BACKOFF_BASE = config.get_float("HTTP_BACKOFF_BASE", 0.5)  # Seconds
+HTTP_BACKOFF_MAX = config.get_float("HTTP_BACKOFF_MAX", 8)  # Seconds
+HTTP_POOL_SIZE = config.get_int("HTTP_POOL_SIZE", 10)
+
+# Status codes that are worth another attempt after waiting
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class RequestError(Exception):
+    """Raised when an API request fails: no connection, a timeout, an error status or an invalid body."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def get_session():
+    """Return the shared session, so TCP/TLS connections are reused between requests."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                # Retries are handled in get() so the backoff can be jittered
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def get_backoff_delay(attempt, retry_after=None):
+    """
+    Return the number of seconds to wait before the next attempt.
+
+    Uses exponential backoff with full jitter, capped at HTTP_BACKOFF_MAX. A numeric
+    Retry-After header from the server takes precedence when it is longer.
+    """
+    delay = random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(float(retry_after), HTTP_BACKOFF_MAX))
+    return delay
+
+
+def get(url, params=None, api='http'):
+    """
+    Perform a GET request on the shared session with timeouts and retries.
+
+    Responses with a status in RETRY_STATUS_CODES and failed connections are retried up
+    to HTTP_MAX_RETRIES times. The last response is returned as is, so callers still
+    decide what to do with its status (see get_json()). A request that gets no response
+    at all raises RequestError.
+
+    With HTTP_CASSETTE_MODE=replay the response comes from the cassette and the network
+    is never used, with HTTP_CASSETTE_MODE=record the returned response is recorded.
+    When metrics are enabled the latency, status, size and retries are recorded per api.
+    """
+    if not metrics.enabled:
+        return _get(url, params)[0]
+
+    start = time.perf_counter()
+    try:
+        response, retries = _get(url, params)
+    except RequestError as e:
+        metrics.observe('http_request_seconds', time.perf_counter() - start, api=api, status='error')
+        metrics.increment('http_errors_total', api=api, error=type(e.__cause__).__name__)
+        raise
+
+    metrics.observe('http_request_seconds', time.perf_counter() - start, api=api, status=response.status_code)
+    metrics.increment('http_response_bytes_total', len(response.content), api=api)
+    if retries:
+        metrics.increment('http_retries_total', retries, api=api)
+    return response
+
+
+def get_json(url, params=None, api='http'):
+    """Perform get() and return the decoded JSON body. Raises RequestError for an error status or invalid JSON."""
+    response = get(url, params, api)
+    if response.status_code >= 400:
+        raise RequestError(f"{api} antwoordde met status {response.status_code}", response.status_code)
+    try:
+        return response.json()
+    except ValueError as e:
+        raise RequestError(f"{api} gaf een ongeldig antwoord: {e}", response.status_code) from e
+
+
+def _get(url, params):
+    """Perform the request of get() and return (response, number of retries)."""
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == REPLAY:
+        try:
+            return cassette.replay(url, params), 0
+        except CassetteMissError as e:
+            raise RequestError(str(e)) from e
+
+    # Imported on first use, so sessions that never call an API do not pay for loading requests
+    import requests
+
+    session = get_session()
+    timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        is_last_attempt = attempt == HTTP_MAX_RETRIES
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except requests.exceptions.ConnectionError as e:
+            # Includes connect timeouts; read timeouts are not retried to avoid blocking too long
+            if is_last_attempt:
+                raise RequestError(f"Geen verbinding: {e}") from e
+            time.sleep(get_backoff_delay(attempt))
+            continue
+        except requests.exceptions.RequestException as e:
+            raise RequestError(str(e)) from e
+
+        if response.status_code in RETRY_STATUS_CODES and not is_last_attempt:
+            retry_after = response.headers.get('Retry-After')
+            response.close()
+            time.sleep(get_backoff_delay(attempt, retry_after))
+            continue
+
+        if cassette is not None:
+            cassette.record(url, params, response)
+        return response, attempt
@@ -0,0 +1,138 @@
+import os
+import re
+import json
+from functools import lru_cache
+
+from config import config
+
+# Optional JSON file with extra synonyms: {"canonical name": ["synonym", ...]}
+INGREDIENT_SYNONYMS_FILE = config.get("INGREDIENT_SYNONYMS_FILE")
+
+# Synonyms that are always known (British/American names and common variations)
+DEFAULT_SYNONYMS = {
+    'eggplant': ['aubergine'],
+    'zucchini': ['courgette'],
+    'cilantro': ['coriander', 'fresh coriander'],
+    'scallion': ['green onion', 'spring onion'],
+    'bell pepper': ['sweet pepper', 'capsicum'],
+    'chickpea': ['garbanzo bean', 'garbanzo'],
+    'powdered sugar': ['icing sugar', "confectioners' sugar"],
+    'ground beef': ['minced beef', 'beef mince'],
+    'arugula': ['rocket'],
+    'shrimp': ['prawn'],
+}
+
+# Words that end with an 's' but are not plurals
+NON_PLURAL_WORDS = {'asparagus', 'couscous', 'hummus', 'molasses', 'swiss', 'citrus', 'octopus', 'grits'}
+
+# Plurals that do not follow the rules in _singularize()
+IRREGULAR_PLURALS = {'leaves': 'leaf', 'loaves': 'loaf', 'halves': 'half', 'calves': 'calf', 'knives': 'knife'}
+
+# Singular forms ending with an 'e' that only get an 's' in the plural, where the plural
+# rules would cut off too much ('cookies' is not 'cooky', 'shoes' is not 'sho')
+E_ENDING_SINGULARS = {
+    'pie', 'cookie', 'brownie', 'smoothie', 'veggie', 'calorie', 'goodie', 'sweetie',
+    'shoe', 'toe', 'canoe', 'sloe', 'roe', 'oboe',
+    'quiche', 'brioche', 'ganache', 'niche',
+}
+
+_synonym_lookup = {}
+
+
+def _singularize(word):
+    """Turn a (simple) English plural into its singular form."""
+    if len(word) <= 3 or word in NON_PLURAL_WORDS or word.endswith('ss'):
+        return word
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word[:-1] in E_ENDING_SINGULARS:
+        return word[:-1]
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def _basic_form(name):
+    """Case-fold, collapse whitespace and singularize the last word of a name."""
+    words = re.sub(r'\s+', ' ', name.strip().casefold()).split(' ')
+    words[-1] = _singularize(words[-1])
+    return ' '.join(words)
+
+
+@lru_cache(maxsize=65536)
+def normalize_ingredient(name):
+    """
+    Return the normalized form of an ingredient name.
+
+    'Tomatoes ', 'tomato' and 'TOMATO' all become 'tomato', and synonyms are mapped onto
+    their canonical name ('aubergines' becomes 'eggplant'). Results are memoized.
+    """
+    basic = _basic_form(name)
+    return _synonym_lookup.get(basic, basic)
+
+
+def set_synonyms(synonyms):
+    """Replace the synonym table ({canonical: [synonym, ...]}) and reset the normalization cache."""
+    _synonym_lookup.clear()
+    for canonical, names in synonyms.items():
+        canonical_form = _basic_form(canonical)
+        for name in names:
+            _synonym_lookup[_basic_form(name)] = canonical_form
+    normalize_ingredient.cache_clear()
+
+
+def load_synonyms(file_path=INGREDIENT_SYNONYMS_FILE):
+    """Load the default synonyms, extended with the ones in the synonyms file when it exists."""
+    synonyms = {canonical: list(names) for canonical, names in DEFAULT_SYNONYMS.items()}
+    if file_path and os.path.isfile(file_path):
+        with open(file_path, mode='r') as file:
+            for canonical, names in json.load(file).items():
+                synonyms.setdefault(canonical, []).extend(names)
+    set_synonyms(synonyms)
+
+
+def normalize_set(names):
+    """Return the set of normalized forms of the given names."""
+    return {normalize_ingredient(name) for name in names if name.strip()}
+
+
+def normalize_map(names):
+    """Map the normalized form of every name onto the first original name (stripped) with that form."""
+    mapping = {}
+    for name in names:
+        if name.strip():
+            mapping.setdefault(normalize_ingredient(name), name.strip())
+    return mapping
+
+
+#------------------------------------------
+# Set based matching
+#------------------------------------------
+
+def find_missing_ingredients(required, available):
+    """
+    Return the required ingredients that are not available.
+
+    'available' is a set of normalized names (see normalize_set). The original names of
+    the missing ingredients are returned in their original order, without duplicates.
+    """
+    missing = []
+    seen = set()
+    for name in required:
+        key = normalize_ingredient(name) if name.strip() else ''
+        if key and key not in available and key not in seen:
+            seen.add(key)
+            missing.append(name)
+    return missing
+
+
+def find_common_ingredients(items, available):
+    """Return the items (original names, in order) that are in the normalized 'available' set."""
+    return [name for name in items if name.strip() and normalize_ingredient(name) in available]
+
+
+load_synonyms()
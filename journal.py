@@ -0,0 +1,73 @@
+import io
+import os
+import csv
+import time
+
+from metrics import metrics
+from storage import append_rows, record_file_operation
+
+# Journal operations
+ADD = '+'
+REMOVE = '-'
+CLEAR = '*'
+
+
+def get_journal_path(file_path):
+    """Return the path of the journal that belongs to a product list CSV file."""
+    return f"{file_path}.journal"
+
+
+def append_records(journal_path, records):
+    """Append (operation, product_name) records to the journal with a single write."""
+    append_rows(journal_path, [list(record) for record in records], encoding='utf-8')
+
+
+def read_records(journal_path, offset=0):
+    """
+    Read the records after offset and return (records, new_offset).
+
+    Only complete lines are read, so a record that another process is still writing is
+    picked up by the next call. A missing journal has no records.
+    """
+    start = time.perf_counter() if metrics.enabled else None
+    try:
+        with open(journal_path, mode='rb') as file:
+            file.seek(offset)
+            data = file.read()
+    except FileNotFoundError:
+        return [], 0
+
+    complete_length = data.rfind(b'\n') + 1
+    if complete_length == 0:
+        return [], offset
+
+    lines = io.StringIO(data[:complete_length].decode('utf-8'), newline='')
+    records = [(row[0], row[1] if len(row) > 1 else '') for row in csv.reader(lines) if row]
+    if start is not None:
+        record_file_operation('read', journal_path, start, len(records), complete_length)
+    return records, offset + complete_length
+
+
+def apply_records(products, records, normalize):
+    """
+    Apply journal records to products, a dict of normalized name -> product name.
+
+    Adding an existing product or removing a missing one changes nothing, so replaying a
+    journal on a snapshot that already contains it gives the same result. That keeps the
+    state correct when a compaction is interrupted between writing the snapshot and
+    truncating the journal.
+    """
+    for operation, name in records:
+        if operation == ADD:
+            products.setdefault(normalize(name), name)
+        elif operation == REMOVE:
+            products.pop(normalize(name), None)
+        elif operation == CLEAR:
+            products.clear()
+
+
+def truncate_journal(journal_path):
+    """Empty the journal after its records were compacted into the snapshot."""
+    with open(journal_path, mode='w') as file:
+        file.flush()
+        os.fsync(file.fileno())
@@ -1,18 +1,21 @@
-import os
-from dotenv import load_dotenv
+import sys
+import json
+import argparse
 
+from config import config, ConfigError, API_KEYS
+from offline import is_offline, set_offline
 from menu_controller import show_menu
 from helper_functions import check_or_create_file, check_or_create_folder
+from recipe_prefetch import start_prefetch
+from recipes import RANDOM_RECIPE_CATEGORIES
 
-#Load environment variables
-load_dotenv()
+FRIDGE_FILE = config.get("FRIDGE_FILE")
+SHOPPING_LIST_FILE = config.get("SHOPPING_LIST_FILE")
+RECIPE_FOLDER = config.get("RECIPES_FOLDER")
+WARM_UP_RECIPES_DEFAULT = config.get_int("WARM_UP_RECIPES", 40)
 
-FRIDGE_FILE = os.getenv("FRIDGE_FILE")
-SHOPPING_LIST_FILE = os.getenv("SHOPPING_LIST_FILE")
-RECIPE_FOLDER = os.getenv("RECIPES_FOLDER")
 
-
-def initialize():
+def initialize(prefetch=True):
     # Check if fridge.csv exist. If not create one in the root directory of the project.
     check_or_create_file(FRIDGE_FILE)
 
@@ -22,11 +25,87 @@ def initialize():
     # Check if recipes folder exist. If not create one in the root directory of the project.
     check_or_create_folder(RECIPE_FOLDER)
 
+    # Start filling the recipe buffers in the background, so random recipes are ready right away
+    if prefetch:
+        start_prefetch(RANDOM_RECIPE_CATEGORIES)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="FridgeChef")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="Run the JSONL commands in PATH ('-' for stdin) without prompts and print JSONL results")
+    parser.add_argument("--output", metavar="PATH", help="Write the batch results to PATH instead of stdout")
+    parser.add_argument("--offline", action="store_true",
+                        help="Serve recipes and weather from local data only, without using the network")
+    parser.add_argument("--warm-up", metavar="N", type=int, nargs="?", const=WARM_UP_RECIPES_DEFAULT,
+                        help=f"Fetch and store N recipes per category for offline use (default {WARM_UP_RECIPES_DEFAULT})")
+    parser.add_argument("--cities", metavar="CITY", nargs="+", default=[],
+                        help="With --warm-up: also store the weather of these cities")
+    arguments = parser.parse_args(argv)
+    if arguments.warm_up is not None and arguments.offline:
+        parser.error("--warm-up kan niet samen met --offline gebruikt worden")
+    return arguments
+
+
+def run_batch_mode(input_path, output_path=None):
+    """Run a JSONL command script headless. Returns the exit code: 1 when a command failed."""
+    # Imported here, so the interactive menu does not load the batch commands
+    from commands import run_batch
+
+    input_file = sys.stdin if input_path == '-' else open(input_path, encoding='utf-8')
+    output_file = sys.stdout if output_path is None else open(output_path, 'w', encoding='utf-8')
+    try:
+        failures = run_batch(input_file, output_file)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    return 1 if failures else 0
+
+
+def run_warm_up(recipes_per_category, cities):
+    """Fill the local recipe corpus and weather for offline use. Returns the exit code: 1 when pages failed."""
+    # Imported here, so the interactive menu does not load the warm-up
+    from cache_warmup import warm_up
+
+    print(f"{recipes_per_category} recepten per categorie worden opgehaald...", file=sys.stderr)
+    result = warm_up(recipes_per_category, cities=cities)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 1 if result['failed_pages'] else 0
+
+
+def check_config():
+    """Stop with a clear message when required settings are missing, warn when the API settings are."""
+    try:
+        config.validate()
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+
+    missing_api_keys = config.get_missing(API_KEYS)
+    if missing_api_keys:
+        print(f"Let op: recepten en weer werken niet zonder {', '.join(missing_api_keys)} in .env", file=sys.stderr)
+
 
 def main():
     """ Main function of FridgeChef. This function starts the application."""
-    #Initialize functions to create files and folders
-    initialize()
+    arguments = parse_arguments()
+    check_config()
+    if arguments.offline:
+        set_offline(True)
+
+    if arguments.warm_up is not None:
+        initialize(prefetch=False)
+        sys.exit(run_warm_up(arguments.warm_up, arguments.cities))
+
+    if arguments.batch:
+        # Batch mode: no prefetching in the background, commands fetch what they need
+        initialize(prefetch=False)
+        sys.exit(run_batch_mode(arguments.batch, arguments.output))
+
+    #Initialize functions to create files and folders, nothing is prefetched offline
+    initialize(prefetch=not is_offline())
 
     #Get menu
     show_menu()
@@ -0,0 +1,158 @@
+from config import config
+from ingredient_matching import normalize_map
+from recipe_ranking import get_recipe_foods, get_recipe_food_names
+
+# Meal plan settings
+MEAL_PLAN_MEALS = config.get_int("MEAL_PLAN_MEALS", 7)
+MEAL_PLAN_POOL_SIZE = config.get_int("MEAL_PLAN_POOL_SIZE", 2000)  # Local candidate recipes considered
+MEAL_PLAN_SWAP_ROUNDS = config.get_int("MEAL_PLAN_SWAP_ROUNDS", 3)  # Improvement rounds after the greedy pick
+
+
+class MealPlan:
+    """The chosen meals with their missing ingredients, and the merged shopping list of the plan."""
+
+    def __init__(self, meals, missing_ingredients, fridge_used, candidate_count):
+        self.meals = meals  # List of (recipe, missing_ingredients), with the food names of the recipe
+        self.missing_ingredients = missing_ingredients  # Sorted union of the missing ingredients
+        self.fridge_used = fridge_used  # Sorted fridge products used by at least one meal, as named in the fridge
+        self.candidate_count = candidate_count
+
+    def to_dict(self):
+        return {
+            'meals': [{'label': recipe['label'], 'uri': recipe.get('uri'), 'missing': missing}
+                      for recipe, missing in self.meals],
+            'missing_ingredients': self.missing_ingredients,
+            'fridge_used': self.fridge_used,
+            'candidates': self.candidate_count,
+        }
+
+
+def count_bits(value):
+    return bin(value).count('1')
+
+
+def encode_recipes(recipes, fridge_foods):
+    """
+    Encode the ingredients of the fridge and of every recipe as bitsets (ints).
+
+    Every distinct food gets one bit, the fridge foods the lowest ones. Recipes without
+    ingredients and repeated recipes (same uri) are left out. Returns (foods, fridge_mask,
+    candidates) where foods maps a bit index to its food and candidates is a list of
+    (recipe, mask).
+    """
+    bits = {food: index for index, food in enumerate(sorted(fridge_foods))}
+    fridge_mask = (1 << len(bits)) - 1
+
+    candidates = []
+    seen_uris = set()
+    for recipe in recipes:
+        uri = recipe.get('uri')
+        if uri is not None:
+            if uri in seen_uris:
+                continue
+            seen_uris.add(uri)
+
+        mask = 0
+        for food in get_recipe_foods(recipe):
+            mask |= 1 << bits.setdefault(food, len(bits))
+        if mask:
+            candidates.append((recipe, mask))
+
+    foods = {index: food for food, index in bits.items()}
+    return foods, fridge_mask, candidates
+
+
+def get_plan_cost(union, fridge_mask):
+    """
+    Return the cost of a plan with the given union of ingredients: (missing ingredients, -fridge products used).
+
+    Costs compare as tuples, so a plan with fewer ingredients to buy always wins, and of
+    plans that buy the same number the one that uses more of the fridge wins.
+    """
+    return count_bits(union & ~fridge_mask), -count_bits(union & fridge_mask)
+
+
+def choose_meals(candidates, fridge_mask, meal_count, swap_rounds=MEAL_PLAN_SWAP_ROUNDS):
+    """
+    Choose meal_count candidates with the smallest union of missing ingredients.
+
+    This is a set cover problem. The greedy step adds the candidate that adds the fewest
+    new missing ingredients, then uses the most fridge products that are not used yet,
+    then has the fewest ingredients in total. The swap rounds then replace single meals
+    by other candidates as long as that lowers the cost of the plan (see get_plan_cost()).
+    Returns the indexes of the chosen candidates.
+    """
+    masks = [mask for _, mask in candidates]
+    chosen = []
+    chosen_set = set()
+    union = 0
+    for _ in range(min(meal_count, len(masks))):
+        best_index, best_score = None, None
+        for index, mask in enumerate(masks):
+            if index in chosen_set:
+                continue
+            new = mask & ~union
+            score = (count_bits(new & ~fridge_mask), -count_bits(new & fridge_mask), count_bits(mask))
+            if best_score is None or score < best_score:
+                best_index, best_score = index, score
+        chosen.append(best_index)
+        chosen_set.add(best_index)
+        union |= masks[best_index]
+
+    for _ in range(swap_rounds):
+        improved = False
+        for position in range(len(chosen)):
+            # Union of the other meals, so every replacement is scored with one OR
+            others = 0
+            for other_position, index in enumerate(chosen):
+                if other_position != position:
+                    others |= masks[index]
+            best_index = chosen[position]
+            best_cost = get_plan_cost(others | masks[best_index], fridge_mask)
+            for index, mask in enumerate(masks):
+                if index in chosen_set:
+                    continue
+                cost = get_plan_cost(others | mask, fridge_mask)
+                if cost < best_cost:
+                    best_index, best_cost = index, cost
+            if best_index != chosen[position]:
+                chosen_set.discard(chosen[position])
+                chosen_set.add(best_index)
+                chosen[position] = best_index
+                improved = True
+        if not improved:
+            break
+
+    return chosen
+
+
+def plan_meals(recipes, fridge_ingredients, meal_count=MEAL_PLAN_MEALS):
+    """
+    Choose meal_count recipes for the fridge that together need as few extra ingredients as possible.
+
+    The foods are matched on their normalized names, but the plan names them the way the
+    recipes and the fridge do ('aubergines', not 'eggplant'), as the missing ingredients
+    are shown to the user and put on the shopping list.
+    """
+    fridge_names = normalize_map(fridge_ingredients)
+    foods, fridge_mask, candidates = encode_recipes(recipes, set(fridge_names))
+    chosen = choose_meals(candidates, fridge_mask, meal_count)
+
+    def get_foods(mask):
+        return [foods[index] for index in range(mask.bit_length()) if mask >> index & 1]
+
+    def get_sorted_names(names, mask):
+        return sorted((names[food] for food in get_foods(mask)), key=str.casefold)
+
+    meals = []
+    missing_names = {}  # Normalized name -> name in the first chosen recipe that needs it
+    union = 0
+    for index in chosen:
+        recipe, mask = candidates[index]
+        recipe_names = get_recipe_food_names(recipe)
+        for food, name in recipe_names.items():
+            missing_names.setdefault(food, name)
+        meals.append((recipe, get_sorted_names(recipe_names, mask & ~fridge_mask)))
+        union |= mask
+    return MealPlan(meals, get_sorted_names(missing_names, union & ~fridge_mask),
+                    get_sorted_names(fridge_names, union & fridge_mask), len(candidates))
@@ -1,7 +1,8 @@
 from fridge import show_products_in_fridge, add_grocery_to_fridge, remove_product_from_fridge
-from recipes import generate_random_recipe, make_recipe_from_fridge, generate_recipe_based_on_weather
+from recipes import generate_random_recipe, make_recipe_from_fridge, make_best_recipe_from_fridge, generate_recipe_based_on_weather, show_saved_recipes, search_saved_recipes, make_meal_plan
 from shopping_list import show_shopping_list, add_product_to_shopping_list, remove_product_from_shopping_list, add_recipe_ingredients_to_shopping_list, clear_shopping_list, check_and_remove_products_in_fridge
 from helper_functions import show_title_text, colored_input, colored_text
+from metrics import metrics, format_table, export_metrics
 
 
 def show_menu():
@@ -19,12 +20,14 @@ def navigate_menus():
             "1 - Koelkast",
             "2 - Recepten",
             "3 - Boodschappenlijstje",
+            "4 - Prestatiemetingen",
             "x - Programma afsluiten"
         ]
         main_menu_callbacks = {
             '1': get_fridge_menu,
             '2': get_recipe_menu,
-            '3': get_shopping_list_menu
+            '3': get_shopping_list_menu,
+            '4': get_metrics_menu
         }
         handle_menu("Hoofdmenu", main_menu_items, main_menu_callbacks)
         break  # Exit loop after user chooses to exit
@@ -50,12 +53,20 @@ def get_recipe_menu():
         "1 - Genereer willekeurig recept",
         "2 - Recept op basis van het weer",
         "3 - Recepten op basis van koelkast voorraad",
+        "4 - Beste recepten op basis van koelkast voorraad",
+        "5 - Bekijk opgeslagen recepten",
+        "6 - Zoek in opgeslagen recepten",
+        "7 - Weekmenu plannen",
         "x - Terug naar hoofdmenu"
     ]
     recipe_menu_callbacks = {
         '1': generate_random_recipe,
         '2': generate_recipe_based_on_weather,
-        '3': make_recipe_from_fridge
+        '3': make_recipe_from_fridge,
+        '4': make_best_recipe_from_fridge,
+        '5': show_saved_recipes,
+        '6': search_saved_recipes,
+        '7': make_meal_plan
     }
     handle_menu("Recepten", recipe_menu_items, recipe_menu_callbacks)
 
@@ -82,6 +93,32 @@ def get_shopping_list_menu():
     handle_menu("Boodschappenlijstje", shopping_list_menu_items, shopping_list_menu_callbacks)
 
 
+def get_metrics_menu():
+    """Displays the performance metrics options."""
+    metrics_menu_items = [
+        "1 - Bekijk metingen",
+        "2 - Exporteer als JSON",
+        "3 - Exporteer als Prometheus tekst",
+        "x - Terug naar hoofdmenu"
+    ]
+    metrics_menu_callbacks = {
+        '1': show_metrics,
+        '2': lambda: print(f"Metingen opgeslagen in {export_metrics('json')}"),
+        '3': lambda: print(f"Metingen opgeslagen in {export_metrics('prometheus')}")
+    }
+    handle_menu("Prestatiemetingen", metrics_menu_items, metrics_menu_callbacks)
+
+
+def show_metrics():
+    """Show the percentiles of the API calls and file operations measured in this session."""
+    if not metrics.enabled:
+        colored_text("Metingen staan uit. Zet METRICS_ENABLED=true in .env om ze te verzamelen.", "yellow")
+        return
+
+    table = format_table(metrics.snapshot())
+    print(table if table else "Er is nog niets gemeten.")
+
+
 def add_grocery_to_fridge_prompt():
     """Prompt the user to add a grocery item to the fridge."""
     colored_text("LET OP: producten moeten in het Engels worden toegevoegd.", "yellow")
@@ -0,0 +1,232 @@
+import os
+import json
+import threading
+import time
+from collections import deque
+
+from config import config, DATA_FOLDER
+
+# Instrumentation is off by default; every instrumented call site checks metrics.enabled first
+METRICS_ENABLED = config.get_bool("METRICS_ENABLED", False)
+# Number of most recent durations per timer that the percentiles are computed from
+METRICS_SAMPLE_SIZE = config.get_int("METRICS_SAMPLE_SIZE", 1024)
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def format_labels(labels):
+    """Return labels as a Prometheus label string, e.g. '{api="edamam",status="200"}'."""
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def make_label_key(labels):
+    """Return labels as a sorted tuple of (key, text value) pairs."""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def get_percentile(sorted_samples, fraction):
+    """Return the nearest-rank percentile of a sorted list."""
+    if not sorted_samples:
+        return None
+    return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+
+
+class Timer:
+    """Count, sum and the most recent samples of one timed operation."""
+
+    __slots__ = ('count', 'total', 'maximum', 'samples')
+
+    def __init__(self, sample_size):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples = deque(maxlen=sample_size)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.samples.append(seconds)
+
+
+class Span:
+    """Times the block of a 'with metrics.span(...)' statement. Extra labels can be set while it runs."""
+
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def set_label(self, key, value):
+        self.labels[key] = value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.labels.setdefault('error', exc_type.__name__)
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class NoSpan:
+    """Stand-in for Span when instrumentation is off, so a disabled span costs one method call."""
+
+    __slots__ = ()
+
+    def set_label(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class MetricsRegistry:
+    """
+    Counters and timers of the application, by name and labels.
+
+    Timers keep an exact count, sum and maximum plus the METRICS_SAMPLE_SIZE most recent
+    durations for the percentiles. When the registry is disabled nothing is recorded and
+    span() returns a shared no-op object.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, sample_size=METRICS_SAMPLE_SIZE):
+        self.enabled = enabled
+        self.sample_size = sample_size
+        self._counters = {}  # (name, labels) -> value
+        self._timers = {}  # (name, labels) -> Timer
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        key = (name, make_label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration of a timer."""
+        if not self.enabled:
+            return
+        key = (name, make_label_key(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = Timer(self.sample_size)
+            timer.observe(seconds)
+
+    def span(self, name, **labels):
+        """Return a context manager that records the duration of its block in timer name."""
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def snapshot(self):
+        """Return all counters and timers (with percentiles in milliseconds) as a JSON-serializable dict."""
+        with self._lock:
+            counters = list(self._counters.items())
+            timers = [(key, timer.count, timer.total, timer.maximum, sorted(timer.samples))
+                      for key, timer in self._timers.items()]
+
+        return {
+            'enabled': self.enabled,
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters)
+            ],
+            'timers': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': count,
+                    'total_ms': round(total * 1000, 3),
+                    'mean_ms': round(total / count * 1000, 3),
+                    'max_ms': round(maximum * 1000, 3),
+                    **{f"p{int(fraction * 100)}_ms": round(get_percentile(samples, fraction) * 1000, 3)
+                       for fraction in PERCENTILES},
+                }
+                for (name, labels), count, total, maximum, samples in sorted(timers, key=lambda timer: timer[0])
+            ],
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix='fridgechef_'):
+        """Return the metrics in the Prometheus text format; timers are summaries in seconds."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted(((key, timer.count, timer.total, sorted(timer.samples))
+                             for key, timer in self._timers.items()), key=lambda timer: timer[0])
+
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {prefix}{name} counter")
+                declared.add(name)
+            lines.append(f"{prefix}{name}{format_labels(labels)} {value}")
+
+        for (name, labels), count, total, samples in timers:
+            if name not in declared:
+                lines.append(f"# TYPE {prefix}{name} summary")
+                declared.add(name)
+            for fraction in PERCENTILES:
+                quantile_labels = labels + (('quantile', fraction),)
+                lines.append(f"{prefix}{name}{format_labels(quantile_labels)} {get_percentile(samples, fraction)}")
+            lines.append(f"{prefix}{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{prefix}{name}_count{format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def format_table(snapshot):
+    """Return the timers and counters of a snapshot as a readable text table."""
+    lines = []
+    if snapshot['timers']:
+        lines.append(f"{'Meting':<44} {'aantal':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for timer in snapshot['timers']:
+            name = timer['name'] + format_labels(tuple(timer['labels'].items()))
+            lines.append(f"{name:<44} {timer['count']:>7} {timer['p50_ms']:>9.2f} {timer['p95_ms']:>9.2f} "
+                         f"{timer['p99_ms']:>9.2f} {timer['max_ms']:>9.2f}")
+    if snapshot['counters']:
+        lines.append("")
+        for counter in snapshot['counters']:
+            name = counter['name'] + format_labels(tuple(counter['labels'].items()))
+            lines.append(f"{name:<44} {counter['value']:>7}")
+    return '\n'.join(lines)
+
+
+def export_metrics(file_format='json', file_path=None):
+    """Write the metrics as 'json' or 'prometheus' text to file_path (default in DATA_FOLDER). Returns the path."""
+    if file_path is None:
+        file_path = os.path.join(DATA_FOLDER, 'metrics.json' if file_format == 'json' else 'metrics.prom')
+    content = metrics.to_json() if file_format == 'json' else metrics.to_prometheus()
+    folder = os.path.dirname(file_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(file_path, 'w') as file:
+        file.write(content)
+    return file_path
+
+
+# Shared registry for the whole application
+metrics = MetricsRegistry()
@@ -0,0 +1,23 @@
+from config import config
+from http_client import RequestError
+
+# Serve recipes and weather from local data only, without using the network
+OFFLINE_MODE = config.get_bool("OFFLINE_MODE", False)
+
+_offline = OFFLINE_MODE
+
+
+def is_offline():
+    """Return True when FridgeChef runs in offline mode."""
+    return _offline
+
+
+def set_offline(enabled):
+    """Turn offline mode on or off for the rest of the session (e.g. from a command line flag)."""
+    global _offline
+    _offline = enabled
+
+
+def is_network_error(error):
+    """Return True for a request that got no response at all, as opposed to an error status from the API."""
+    return isinstance(error, RequestError) and error.status_code is None
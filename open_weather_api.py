@@ -1,30 +1,208 @@
 import os
-import requests
-from dotenv import load_dotenv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-load_dotenv()
+from config import config, DATA_FOLDER
+import http_client
+from offline import is_offline, is_network_error
+from storage import file_lock, write_file_atomic
 
 # OpenWeather API credentials and Base URL
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-OPENWEATHER_URL = os.getenv("OPENWEATHER_BASE_URL")
+OPENWEATHER_API_KEY = config.get("OPENWEATHER_API_KEY")
+OPENWEATHER_URL = config.get("OPENWEATHER_BASE_URL")
 
+# Weather barely changes within a few minutes, so answers are reused for a while
+WEATHER_CACHE_TTL = config.get_int("WEATHER_CACHE_TTL", 600)  # Seconds
+# Maximum number of cities looked up at the same time in batch mode
+WEATHER_MAX_WORKERS = config.get_int("WEATHER_MAX_WORKERS", 8)
+# The last known weather per city is kept on disk for offline mode
+WEATHER_FILE = config.get("WEATHER_FILE", os.path.join(DATA_FOLDER, "last_weather.json"))
+
+_weather_cache = None  # Normalized city name -> (time fetched, weather data), loaded from WEATHER_FILE
+_weather_cache_changed = False  # True while the cache has weather that is not written to WEATHER_FILE yet
+_weather_cache_lock = threading.Lock()
+
+
+def _read_weather_file():
+    """Read the weather per city from WEATHER_FILE, empty when the file does not exist or is damaged."""
+    if not os.path.exists(WEATHER_FILE):
+        return {}
+    try:
+        with open(WEATHER_FILE, encoding='utf-8') as file:
+            data = json.load(file)
+        return {key: tuple(entry) for key, entry in data.items()}
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def _get_weather_cache():
+    """Return the weather cache, read from WEATHER_FILE the first time. Lock must be held."""
+    global _weather_cache
+    if _weather_cache is None:
+        _weather_cache = _read_weather_file()
+    return _weather_cache
+
+
+def _set_cached_weather(cache_key, weather_data):
+    """Put fetched weather in the cache, _save_weather_cache() writes it to disk."""
+    global _weather_cache_changed
+    with _weather_cache_lock:
+        _get_weather_cache()[cache_key] = (time.time(), weather_data)
+        _weather_cache_changed = True
+
+
+def _save_weather_cache():
+    """
+    Write the weather cache to WEATHER_FILE (atomically) when it changed. Lock must not be held.
+
+    A copy of the cache is taken under the lock and written outside it, so lookups of other
+    cities do not wait for the disk. Other FridgeChef processes write the same file, so
+    under the file lock the file is read again and the newest weather per city of both is
+    kept (in the file and in the cache).
+    """
+    global _weather_cache_changed
+    with _weather_cache_lock:
+        if not _weather_cache_changed:
+            return
+        snapshot = dict(_get_weather_cache())
+        _weather_cache_changed = False
+
+    try:
+        folder = os.path.dirname(WEATHER_FILE)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with file_lock(WEATHER_FILE):
+            newer = {key: entry for key, entry in _read_weather_file().items()
+                     if key not in snapshot or snapshot[key][0] < entry[0]}
+            snapshot.update(newer)
+            write_file_atomic(WEATHER_FILE, json.dumps(snapshot, ensure_ascii=False).encode('utf-8'))
+    except Exception:
+        with _weather_cache_lock:
+            _weather_cache_changed = True
+        raise
+
+    with _weather_cache_lock:
+        cache = _get_weather_cache()
+        for key, entry in newer.items():
+            if key not in cache or cache[key][0] < entry[0]:
+                cache[key] = entry
+
+
+def normalize_city_name(city_name):
+    """ Normalize a city name for use as cache key ('  New  York' and 'new york' are the same). """
+    return ' '.join(city_name.split()).casefold()
+
+
+def get_weather(city_name, save=True):
+    """
+    Fetch the current weather for a city using OpenWeather API (cached for WEATHER_CACHE_TTL seconds).
+
+    In offline mode the last known weather of the city is returned, whatever its age. The
+    same happens when the network cannot be reached. With save=False fetched weather is
+    only kept in memory until the next _save_weather_cache().
+    """
+    cache_key = normalize_city_name(city_name)
+    with _weather_cache_lock:
+        cached = _get_weather_cache().get(cache_key)
+    if cached and (is_offline() or time.time() - cached[0] < WEATHER_CACHE_TTL):
+        return cached[1]
+
+    if is_offline():
+        print(f"Geen opgeslagen weerdata voor {city_name} (offline modus).")
+        return None
 
-def get_weather(city_name):
-    """ Fetch the current weather for a city using OpenWeather API. """
     params = {
         'q': city_name,
         'appid': OPENWEATHER_API_KEY,
         'units': 'metric'
     }
     try:
-        response = requests.get(OPENWEATHER_URL, params=params)
-        response.raise_for_status()
-        return response.json()
+        weather_data = http_client.get_json(OPENWEATHER_URL, params=params, api='openweather')
+        _set_cached_weather(cache_key, weather_data)
+        if save:
+            _save_weather_cache()
+        return weather_data
     except Exception as e:
         # Exception handling, logs the message
         print(f"Probleem met ophalen weerdata: {e}")
+        if cached and is_network_error(e):
+            print("Het laatst bekende weer wordt gebruikt.")
+            return cached[1]
         return None
 
+def get_last_known_weather(city_name):
+    """ Return the last weather data fetched for a city, even when it is older than the TTL (or None). """
+    with _weather_cache_lock:
+        cached = _get_weather_cache().get(normalize_city_name(city_name))
+    return cached[1] if cached else None
+
+
+def predict_recipe_types(city_name, limit=2):
+    """
+    Guess the recipe types get_recipe_type_for_weather will return for a city.
+
+    Based on the last known weather of the city: the type for that temperature first,
+    followed by the types for a few degrees colder and warmer. Returns an empty list for
+    a city without a known weather.
+    """
+    weather_data = get_last_known_weather(city_name)
+    if not weather_data:
+        return []
+
+    temp = weather_data['main']['temp']
+    weather_description = weather_data['weather'][0]['description']
+    recipe_types = []
+    for temp_change in (0, -3, 3):
+        recipe_type = select_recipe_type_by_weather(temp + temp_change, weather_description)
+        if recipe_type not in recipe_types:
+            recipe_types.append(recipe_type)
+    return recipe_types[:limit]
+
+
+def get_recipe_type_for_weather(weather_data):
+    """ Return the recipe type for the weather data of a city. """
+    temp = weather_data['main']['temp']
+    weather_description = weather_data['weather'][0]['description']
+    return select_recipe_type_by_weather(temp, weather_description)
+
+
+def get_recipe_types_for_cities(city_names, max_workers=WEATHER_MAX_WORKERS):
+    """
+    Look up the weather and recipe type of many cities concurrently.
+
+    Cities are fetched on a thread pool of at most max_workers threads, and a city that
+    occurs more than once (after normalization) is only looked up once. The fetched
+    weather is written to disk once, after the whole batch. Returns a dictionary city
+    name -> (weather data, recipe type), both None when the weather could not be fetched.
+    """
+    unique_cities = {}
+    for city_name in city_names:
+        unique_cities.setdefault(normalize_city_name(city_name), city_name)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        weather_by_key = dict(zip(unique_cities, executor.map(partial(get_weather, save=False),
+                                                              unique_cities.values())))
+    try:
+        _save_weather_cache()
+    except Exception as e:
+        print(f"Probleem met opslaan weerdata: {e}")
+
+    results = {}
+    for city_name in city_names:
+        weather_data = weather_by_key[normalize_city_name(city_name)]
+        recipe_type = get_recipe_type_for_weather(weather_data) if weather_data else None
+        results[city_name] = (weather_data, recipe_type)
+    return results
+
+
+# Every recipe type select_recipe_type_by_weather() can return
+WEATHER_RECIPE_TYPES = ['hot chocolate', 'soup', 'stew', 'baked pasta', 'roast', 'grilled sandwich', 'salad', 'smoothie',
+                        'ice cream']
+
+
 def select_recipe_type_by_weather(temp, weather_condition):
     """ Select a recipe type based on temperature and weather condition. """
     if weather_condition in ['snow', 'rain']:
@@ -0,0 +1,173 @@
+import os
+
+from config import config
+from ingredient_matching import normalize_ingredient
+from journal import ADD, REMOVE, get_journal_path, append_records, read_records, apply_records, truncate_journal
+from storage import file_lock, get_file_signature, read_rows, write_rows_atomic
+
+# Number of journal records after which the journal is compacted into the CSV snapshot
+JOURNAL_COMPACT_THRESHOLD = config.get_int("JOURNAL_COMPACT_THRESHOLD", 500)
+
+
+class ProductRepository:
+    """
+    In-memory view of a product list (the fridge or the shopping list).
+
+    The list is stored as a 'product_name' CSV snapshot plus an append-only journal
+    ('<file>.journal') of add/remove records, so every change costs a single append no
+    matter how long the list is. Once the journal holds JOURNAL_COMPACT_THRESHOLD records
+    it is compacted back into the snapshot.
+
+    The products are kept in memory by their normalized name (see ingredient_matching)
+    for O(1) membership checks. The snapshot is only parsed again when it changed and new
+    journal records are read incrementally. Changes are made under an exclusive file lock
+    (see storage), so several FridgeChef processes can safely share the same files.
+    """
+
+    def __init__(self, file_path, lowercase_names=False, compact_threshold=JOURNAL_COMPACT_THRESHOLD):
+        self.file_path = file_path
+        self.journal_path = get_journal_path(file_path)
+        self.lowercase_names = lowercase_names
+        self.compact_threshold = compact_threshold
+        self._header = ['product_name']
+        self._products = {}  # Normalized name -> product name, in list order
+        self._snapshot_signature = None
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    def _refresh(self):
+        """Bring the in-memory products up to date with the snapshot and the journal."""
+        snapshot_signature = get_file_signature(self.file_path)
+        try:
+            journal_stat = os.stat(self.journal_path)
+            journal_inode, journal_size = journal_stat.st_ino, journal_stat.st_size
+        except FileNotFoundError:
+            journal_inode, journal_size = None, 0
+
+        # A new snapshot or a truncated/replaced journal means a compaction happened: reload everything
+        if (snapshot_signature != self._snapshot_signature or journal_inode != self._journal_inode
+                or journal_size < self._journal_offset):
+            header, rows = read_rows(self.file_path)
+            self._header = header or ['product_name']
+            self._products = {}
+            # Collect and clean product names from each row
+            apply_records(self._products, [(ADD, row[0].strip()) for row in rows if row[0].strip()], normalize_ingredient)
+            self._snapshot_signature = snapshot_signature
+            self._journal_inode = journal_inode
+            self._journal_offset = 0
+            self._journal_records = 0
+
+        if journal_size > self._journal_offset:
+            records, self._journal_offset = read_records(self.journal_path, self._journal_offset)
+            apply_records(self._products, records, normalize_ingredient)
+            self._journal_records += len(records)
+
+    def _append(self, records):
+        """Append records to the journal and apply them in memory. Lock must be held."""
+        append_records(self.journal_path, records)
+        apply_records(self._products, records, normalize_ingredient)
+        # Nobody else can write while the lock is held, so everything up to the end has been applied
+        journal_stat = os.stat(self.journal_path)
+        self._journal_inode = journal_stat.st_ino
+        self._journal_offset = journal_stat.st_size
+        self._journal_records += len(records)
+
+        if self._journal_records >= self.compact_threshold:
+            self._compact()
+
+    def _compact(self):
+        """Write the current products as the new snapshot and empty the journal. Lock must be held."""
+        write_rows_atomic(self.file_path, self._header, [[product] for product in self._products.values()])
+        if os.path.exists(self.journal_path):
+            truncate_journal(self.journal_path)
+        self._snapshot_signature = get_file_signature(self.file_path)
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    def _clean_name(self, name):
+        """Return the name as it is stored in the file."""
+        name = name.strip()
+        return name.lower() if self.lowercase_names else name
+
+    def get_products(self):
+        """Return a list of the products."""
+        self._refresh()
+        return list(self._products.values())
+
+    def get_product_set(self):
+        """Return the normalized products as a set-like view for fast membership checks."""
+        self._refresh()
+        return self._products.keys()
+
+    def contains(self, name):
+        """Check if a product is in the list, ignoring case, whitespace and plural forms."""
+        self._refresh()
+        return normalize_ingredient(name) in self._products
+
+    def add(self, name):
+        """Add a single product. Returns False when it was already in the list."""
+        return bool(self.add_many([name]))
+
+    def add_many(self, names):
+        """
+        Add several products with one write.
+
+        Names that are already in the list, or that occur twice in names, are skipped.
+        Returns the list of products that were added.
+        """
+        with file_lock(self.file_path):
+            self._refresh()
+            known = set()
+            added = []
+            for name in names:
+                product = self._clean_name(name)
+                key = normalize_ingredient(product) if product else ''
+                if product and key not in self._products and key not in known:
+                    known.add(key)
+                    added.append(product)
+
+            if added:
+                self._append([(ADD, product) for product in added])
+        return added
+
+    def remove(self, name):
+        """Remove a product (matched on its normalized name). Returns False when it was not in the list."""
+        return bool(self.remove_many([name]))
+
+    def remove_many(self, names):
+        """Remove several products (matched on their normalized names) with one write. Returns the removed products."""
+        with file_lock(self.file_path):
+            self._refresh()
+            keys = dict.fromkeys(normalize_ingredient(name) for name in names if name.strip())
+            removed = [self._products[key] for key in keys if key in self._products]
+
+            if removed:
+                self._append([(REMOVE, product) for product in removed])
+        return removed
+
+    def clear(self):
+        """Remove all products, but keep the header."""
+        with file_lock(self.file_path):
+            self._refresh()
+            self._products.clear()
+            self._compact()
+
+    def compact(self):
+        """Fold the journal into the CSV snapshot, so the CSV file holds the complete list."""
+        with file_lock(self.file_path):
+            self._refresh()
+            self._compact()
+
+    #------------------------------------------
+    # Import/export as plain 'product_name' CSV
+    #------------------------------------------
+
+    def export_csv(self, export_path):
+        """Write the complete list to a 'product_name' CSV file."""
+        write_rows_atomic(export_path, self._header, [[product] for product in self.get_products()])
+
+    def import_csv(self, import_path):
+        """Add the products of a 'product_name' CSV file. Returns the products that were added."""
+        _, rows = read_rows(import_path)
+        return self.add_many(row[0] for row in rows)
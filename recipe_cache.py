@@ -0,0 +1,145 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+from config import config, DATA_FOLDER
+
+# Location and limits of the on-disk Edamam response cache
+RECIPE_CACHE_FILE = config.get("RECIPE_CACHE_FILE", os.path.join(DATA_FOLDER, "recipe_cache.db"))
+RECIPE_CACHE_TTL = config.get_int("RECIPE_CACHE_TTL", 24 * 60 * 60)  # Seconds
+RECIPE_CACHE_MAX_ENTRIES = config.get_int("RECIPE_CACHE_MAX_ENTRIES", 1000)
+
+# Random queries are answered from a pool of recipes that is refreshed much more often
+RANDOM_RECIPE_POOL_TTL = config.get_int("RANDOM_RECIPE_POOL_TTL", 5 * 60)  # Seconds
+RANDOM_RECIPE_POOL_SIZE = config.get_int("RANDOM_RECIPE_POOL_SIZE", 20)  # Recipes fetched per pool
+
+# Parameters that never influence the response and must not end up in the key
+IGNORED_PARAMS = {'app_id', 'app_key'}
+
+# Parameters that select a part of the results, one pool serves every part of a random query
+POOL_IGNORED_PARAMS = {'from', 'to'}
+
+
+def normalize_query(query):
+    """Lowercase and strip a query and sort its comma separated terms."""
+    return ','.join(sorted(term.strip() for term in query.lower().split(',') if term.strip()))
+
+
+def make_cache_key(params):
+    """
+    Build a normalized cache key out of request parameters.
+
+    Credentials are dropped, strings are lowercased and stripped and comma separated
+    queries are sorted, so 'Egg, tomato' and 'tomato,egg' share the same entry.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if name in IGNORED_PARAMS:
+            continue
+        if isinstance(value, str):
+            value = normalize_query(value) if name == 'q' else value.strip().lower()
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True)
+
+
+def make_pool_key(params):
+    """Build the key of the recipe pool of a random query, the same for every page and count."""
+    return make_cache_key({name: value for name, value in params.items() if name not in POOL_IGNORED_PARAMS})
+
+
+class ResponseCache:
+    """SQLite backed key/value cache with a TTL and a least recently used size limit."""
+
+    def __init__(self, file_path, ttl=RECIPE_CACHE_TTL, max_entries=RECIPE_CACHE_MAX_ENTRIES):
+        self.file_path = file_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open the database on first use and create the table if needed."""
+        if self._connection is None:
+            folder = os.path.dirname(self.file_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            self._connection = sqlite3.connect(self.file_path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key, ttl=None):
+        """Return the cached value for key, or None when it is missing or older than ttl (default self.ttl)."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            value, created_at = row
+            if now - created_at > ttl:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                connection.commit()
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            connection.commit()
+            self.stats['hits'] += 1
+            return json.loads(value)
+
+    def set(self, key, value):
+        """Store a JSON serializable value and evict the least recently used entries when full."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+
+            count = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                connection.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.stats['evictions'] += overflow
+            connection.commit()
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM responses")
+            connection.commit()
+
+    def get_stats(self):
+        """Return the hit/miss counters together with the hit ratio."""
+        lookups = self.stats['hits'] + self.stats['misses']
+        stats = dict(self.stats)
+        stats['hit_ratio'] = self.stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+# Shared cache used by the Edamam API functions
+recipe_cache = ResponseCache(RECIPE_CACHE_FILE)
+
+
+def get_cache_stats():
+    """Return the hit/miss counters of the recipe cache (hits are network calls saved)."""
+    return recipe_cache.get_stats()
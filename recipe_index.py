@@ -0,0 +1,155 @@
+import os
+import json
+import heapq
+import sqlite3
+import threading
+from collections import Counter
+
+from config import config, DATA_FOLDER
+from recipe_ranking import get_recipe_foods, rank_recipes
+from recipe_record import Recipe
+from recipe_cache import normalize_query
+from ingredient_matching import normalize_ingredient, normalize_set
+
+# Location of the local corpus of every recipe received from Edamam
+RECIPE_INDEX_FILE = config.get("RECIPE_INDEX_FILE", os.path.join(DATA_FOLDER, "recipe_index.db"))
+
+
+class RecipeIndex:
+    """
+    Local recipe corpus with an inverted index from ingredient (food) to recipe.
+
+    Recipes are stored as JSON in SQLite. The posting lists and the number of ingredients
+    per recipe are kept in memory, so matching a fridge only touches the recipes that share
+    at least one ingredient with it. Full recipes are only loaded for the best matches.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._connection = None
+        self._postings = None  # Food -> set of recipe ids
+        self._food_counts = None  # Recipe id -> number of unique foods
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open the database on first use and load the posting lists in memory."""
+        if self._connection is None:
+            folder = os.path.dirname(self.file_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            connection = sqlite3.connect(self.file_path, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS recipes (id INTEGER PRIMARY KEY, uri TEXT UNIQUE NOT NULL, data TEXT NOT NULL)"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS recipe_foods (food TEXT NOT NULL, recipe_id INTEGER NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS recipe_foods_food ON recipe_foods (food)")
+            # The Edamam queries that returned a recipe, so recipes can be looked up per category offline
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS recipe_queries (query TEXT NOT NULL, recipe_id INTEGER NOT NULL, "
+                "PRIMARY KEY (query, recipe_id))"
+            )
+            connection.commit()
+
+            self._postings = {}
+            self._food_counts = Counter()
+            for food, recipe_id in connection.execute("SELECT food, recipe_id FROM recipe_foods"):
+                # Normalized again, so changes to the synonym table apply to older entries too
+                recipe_ids = self._postings.setdefault(normalize_ingredient(food), set())
+                if recipe_id not in recipe_ids:
+                    recipe_ids.add(recipe_id)
+                    self._food_counts[recipe_id] += 1
+            self._connection = connection
+        return self._connection
+
+    def add_recipes(self, recipes, query=None):
+        """
+        Add recipes to the corpus. Recipes that are already known (same uri) are skipped.
+
+        When the query that returned the recipes is given, it is recorded for every recipe,
+        new or known, so get_recipes_for_query() can find them.
+        """
+        query = normalize_query(query) if query else None
+        with self._lock:
+            connection = self._connect()
+            for recipe in recipes:
+                uri = recipe.get('uri')
+                if uri is None:
+                    continue
+                cursor = connection.execute("INSERT OR IGNORE INTO recipes (uri, data) VALUES (?, ?)", (uri, json.dumps(Recipe.from_dict(recipe).to_dict())))
+                if cursor.rowcount == 0:
+                    if query:
+                        recipe_id = connection.execute("SELECT id FROM recipes WHERE uri = ?", (uri,)).fetchone()[0]
+                        connection.execute("INSERT OR IGNORE INTO recipe_queries (query, recipe_id) VALUES (?, ?)",
+                                           (query, recipe_id))
+                    continue
+
+                recipe_id = cursor.lastrowid
+                foods = get_recipe_foods(recipe)
+                connection.executemany("INSERT INTO recipe_foods (food, recipe_id) VALUES (?, ?)",
+                                       [(food, recipe_id) for food in foods])
+                if query:
+                    connection.execute("INSERT INTO recipe_queries (query, recipe_id) VALUES (?, ?)", (query, recipe_id))
+                for food in foods:
+                    self._postings.setdefault(food, set()).add(recipe_id)
+                self._food_counts[recipe_id] = len(foods)
+            connection.commit()
+
+    def get_recipes(self, recipe_ids):
+        """Return the stored recipes for the given ids, in the same order."""
+        with self._lock:
+            connection = self._connect()
+            recipes = {}
+            for recipe_id in recipe_ids:
+                row = connection.execute("SELECT data FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+                if row:
+                    recipes[recipe_id] = Recipe.from_dict(json.loads(row[0]))
+        return [recipes[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes]
+
+    def get_recipes_for_query(self, query, limit=20):
+        """Return up to limit stored recipes that Edamam returned for the query, in random order."""
+        with self._lock:
+            connection = self._connect()
+            rows = connection.execute(
+                "SELECT recipe_id FROM recipe_queries WHERE query = ? ORDER BY RANDOM() LIMIT ?",
+                (normalize_query(query), limit)
+            ).fetchall()
+        return self.get_recipes([row[0] for row in rows])
+
+    def count_for_query(self, query):
+        """Return the number of stored recipes for a query."""
+        with self._lock:
+            connection = self._connect()
+            return connection.execute("SELECT COUNT(*) FROM recipe_queries WHERE query = ?",
+                                      (normalize_query(query),)).fetchone()[0]
+
+    def find_recipes_for_fridge(self, fridge_ingredients, top_k=5):
+        """
+        Return the best local matches for the fridge as (recipe, coverage, missing_ingredients).
+
+        The posting lists of the fridge items are merged into a count per recipe, which
+        gives the coverage of every candidate without loading a single recipe.
+        """
+        fridge_foods = normalize_set(fridge_ingredients)
+
+        with self._lock:
+            self._connect()
+            matches = Counter()
+            for food in fridge_foods:
+                matches.update(self._postings.get(food, ()))
+            scored = [
+                (-(count / self._food_counts[recipe_id]), self._food_counts[recipe_id] - count, recipe_id)
+                for recipe_id, count in matches.items()
+            ]
+
+        best_ids = [recipe_id for _, _, recipe_id in heapq.nsmallest(top_k, scored)]
+        return rank_recipes(self.get_recipes(best_ids), fridge_foods, top_k)
+
+    def count(self):
+        """Return the number of recipes in the corpus."""
+        with self._lock:
+            self._connect()
+            return len(self._food_counts)
+
+
+# Shared corpus of all recipes received from Edamam
+recipe_index = RecipeIndex(RECIPE_INDEX_FILE)
@@ -0,0 +1,107 @@
+import queue
+import threading
+from collections import deque
+
+from config import config
+from edamam_api import get_recipe_page
+
+# Prefetch settings
+PREFETCH_ENABLED = config.get_bool("PREFETCH_ENABLED", True)
+PREFETCH_BUFFER_SIZE = config.get_int("PREFETCH_BUFFER_SIZE", 10)  # Ready recipes kept per category
+PREFETCH_PAGE_SIZE = config.get_int("PREFETCH_PAGE_SIZE", 20)  # Recipes requested per refill
+
+
+class RecipePrefetcher:
+    """
+    Keeps a bounded buffer of ready recipes per category, filled by a background thread.
+
+    pop() never waits on the network: it returns a buffered recipe or None, and schedules a
+    refill whenever a buffer drops to half its size. Refills fetch a page of random recipes
+    in a single request. Pages of a random query are samples of the same pool whatever
+    their offset, so they can repeat recipes: recipes that are buffered or were among the
+    last buffer_size popped ones are not buffered again.
+    """
+
+    def __init__(self, fetch_page, buffer_size=PREFETCH_BUFFER_SIZE, page_size=PREFETCH_PAGE_SIZE):
+        self.fetch_page = fetch_page
+        self.buffer_size = buffer_size
+        self.page_size = page_size
+        self._buffers = {}  # Category -> deque of recipes
+        self._popped_uris = {}  # Category -> deque of the uris of the last popped recipes
+        self._scheduled = set()  # Categories waiting in the refill queue
+        self._refill_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, categories=()):
+        """Start the background worker and fill the buffers of the given categories."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="recipe-prefetch", daemon=True)
+                self._thread.start()
+            for category in categories:
+                self._buffers.setdefault(category, deque(maxlen=self.buffer_size))
+                self._schedule_refill(category)
+
+    def pop(self, category):
+        """Return a buffered recipe for the category, or None when the buffer is empty."""
+        with self._lock:
+            buffer = self._buffers.setdefault(category, deque(maxlen=self.buffer_size))
+            recipe = buffer.popleft() if buffer else None
+            if recipe is not None and recipe.get('uri') is not None:
+                self._popped_uris.setdefault(category, deque(maxlen=self.buffer_size)).append(recipe.get('uri'))
+            if len(buffer) <= self.buffer_size // 2 and self._thread is not None:
+                self._schedule_refill(category)
+        return recipe
+
+    def add(self, category, recipes):
+        """Put recipes that were fetched elsewhere into the buffer of a category."""
+        with self._lock:
+            self._extend_buffer(category, recipes)
+
+    def buffered_count(self, category):
+        """Return the number of ready recipes for a category."""
+        with self._lock:
+            return len(self._buffers.get(category, ()))
+
+    def _schedule_refill(self, category):
+        """Queue a refill for the category unless one is already pending. Lock must be held."""
+        if category not in self._scheduled:
+            self._scheduled.add(category)
+            self._refill_queue.put(category)
+
+    def _extend_buffer(self, category, recipes):
+        """Add recipes to the buffer of a category, skipping buffered and recently popped ones. Lock must be held."""
+        buffer = self._buffers.setdefault(category, deque(maxlen=self.buffer_size))
+        buffered_uris = {recipe.get('uri') for recipe in buffer}
+        buffered_uris.update(self._popped_uris.get(category, ()))
+        for recipe in recipes:
+            if len(buffer) >= self.buffer_size:
+                break
+            if recipe.get('uri') is None or recipe.get('uri') not in buffered_uris:
+                buffer.append(recipe)
+                buffered_uris.add(recipe.get('uri'))
+
+    def _worker(self):
+        """Refill the buffers in the background, one page request per scheduled category."""
+        while True:
+            category = self._refill_queue.get()
+            try:
+                recipes = self.fetch_page(category, 0, self.page_size)
+            except Exception:
+                # Failures are silent here, pop() callers fall back to a live fetch
+                recipes = []
+
+            with self._lock:
+                self._scheduled.discard(category)
+                self._extend_buffer(category, recipes)
+
+
+# Shared prefetcher used by the recipe flows
+recipe_prefetcher = RecipePrefetcher(get_recipe_page)
+
+
+def start_prefetch(categories):
+    """Start prefetching recipes for the given categories when prefetching is enabled."""
+    if PREFETCH_ENABLED:
+        recipe_prefetcher.start(categories)
@@ -0,0 +1,65 @@
+import heapq
+
+from ingredient_matching import normalize_set, normalize_map
+from recipe_record import Recipe
+
+
+def get_recipe_foods(recipe):
+    """Return the unique, normalized food names of a recipe."""
+    if isinstance(recipe, Recipe):
+        return normalize_set(recipe.foods or ())
+    return normalize_set(ingredient['food'] for ingredient in recipe.get('ingredients', []))
+
+
+def get_recipe_food_names(recipe):
+    """Map the normalized food names of a recipe onto the names used in the recipe."""
+    if isinstance(recipe, Recipe):
+        return normalize_map(recipe.foods or ())
+    return normalize_map(ingredient['food'] for ingredient in recipe.get('ingredients', []))
+
+
+def score_recipe(recipe_foods, fridge_set):
+    """
+    Score a recipe against the fridge.
+
+    recipe_foods maps the normalized food names of the recipe onto their original names
+    (see get_recipe_food_names()). The foods are matched on the normalized names, but the
+    missing ingredients are returned with the names of the recipe ('aubergines', not
+    'eggplant'), as they are shown to the user and put on the shopping list.
+
+    Returns a tuple (coverage, missing_ingredients), where coverage is the fraction of the
+    recipe ingredients that are in the fridge.
+    """
+    if not recipe_foods:
+        return 0.0, []
+    missing = recipe_foods.keys() - fridge_set
+    coverage = 1 - len(missing) / len(recipe_foods)
+    return coverage, sorted((recipe_foods[food] for food in missing), key=str.casefold)
+
+
+def rank_recipes(recipes, fridge_ingredients, top_k=5):
+    """
+    Rank candidate recipes by how well the fridge covers them.
+
+    All candidates are scored in one pass with set operations against a single fridge set.
+    Recipes are ordered by the highest coverage first and the fewest missing ingredients
+    second. Returns a list of (recipe, coverage, missing_ingredients) tuples of at most top_k.
+    """
+    fridge_set = normalize_set(fridge_ingredients)
+
+    scored = []
+    seen_uris = set()
+    for index, recipe in enumerate(recipes):
+        # The same recipe can show up more than once in a page of random results
+        uri = recipe.get('uri')
+        if uri is not None:
+            if uri in seen_uris:
+                continue
+            seen_uris.add(uri)
+
+        coverage, missing = score_recipe(get_recipe_food_names(recipe), fridge_set)
+        # The index keeps the order stable for equal scores and avoids comparing dicts
+        scored.append((-coverage, len(missing), index, recipe, missing))
+
+    best = heapq.nsmallest(top_k, scored)
+    return [(recipe, -negative_coverage, missing) for negative_coverage, _, _, recipe, missing in best]
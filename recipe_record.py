@@ -0,0 +1,99 @@
+import sys
+from collections.abc import Mapping
+
+# The recipe fields FridgeChef uses; requested from Edamam with the 'field' parameter
+RECIPE_FIELDS = ('uri', 'label', 'source', 'url', 'mealType', 'dishType', 'cuisineType', 'ingredientLines',
+                 'ingredients', 'calories')
+
+# Edamam field name -> attribute of a Recipe
+FIELD_ATTRIBUTES = {
+    'uri': 'uri',
+    'label': 'label',
+    'source': 'source',
+    'url': 'url',
+    'mealType': 'meal_type',
+    'dishType': 'dish_type',
+    'cuisineType': 'cuisine_type',
+    'ingredientLines': 'ingredient_lines',
+    'ingredients': 'foods',
+    'calories': 'calories',
+}
+
+
+def intern_all(values):
+    """Return the strings as a tuple of interned strings, or None when there are no values."""
+    if values is None:
+        return None
+    return tuple(sys.intern(value) for value in values)
+
+
+class Recipe(Mapping):
+    """
+    Compact, read-only recipe with only the fields in RECIPE_FIELDS.
+
+    Edamam recipes carry large nutrient, digest and image blocks that FridgeChef never
+    uses. A Recipe keeps the used fields in slots instead of a dict, the lists as tuples
+    and the ingredients as their food names only. Type labels and food names are interned,
+    because the same few values repeat over thousands of recipes.
+
+    It can be used like the recipe dictionary it replaces: recipe['label'],
+    recipe.get('mealType', []) and dict(recipe) work, and fields that were missing in the
+    response are missing here too. List fields are returned as tuples and
+    recipe['ingredients'] returns a list of {'food': name} dictionaries.
+    """
+
+    __slots__ = ('uri', 'label', 'source', 'url', 'meal_type', 'dish_type', 'cuisine_type', 'ingredient_lines',
+                 'foods', 'calories')
+
+    def __init__(self, uri, label, source, url, meal_type, dish_type, cuisine_type, ingredient_lines, foods,
+                 calories):
+        self.uri = uri
+        self.label = label
+        self.source = source
+        self.url = url
+        self.meal_type = meal_type
+        self.dish_type = dish_type
+        self.cuisine_type = cuisine_type
+        self.ingredient_lines = ingredient_lines
+        self.foods = foods
+        self.calories = calories
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Recipe from an Edamam recipe dictionary (full or projected) or from dict(recipe)."""
+        if isinstance(data, Recipe):
+            return data
+        return cls(
+            data.get('uri'),
+            data.get('label'),
+            data.get('source'),
+            data.get('url'),
+            intern_all(data.get('mealType')),
+            intern_all(data.get('dishType')),
+            intern_all(data.get('cuisineType')),
+            tuple(data['ingredientLines']) if 'ingredientLines' in data else None,
+            intern_all(ingredient['food'] for ingredient in data['ingredients']) if 'ingredients' in data else None,
+            data.get('calories'),
+        )
+
+    def __getitem__(self, key):
+        value = getattr(self, FIELD_ATTRIBUTES[key])
+        if value is None:
+            raise KeyError(key)
+        if key == 'ingredients':
+            return [{'food': food} for food in value]
+        return value
+
+    def __iter__(self):
+        return (key for key, attribute in FIELD_ATTRIBUTES.items() if getattr(self, attribute) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        """Return the recipe as a plain dictionary in the Edamam format, e.g. for JSON."""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in self.items()}
+
+    def __repr__(self):
+        return f"Recipe({self.label!r})"
+
@@ -0,0 +1,429 @@
+import os
+import re
+import json
+import time
+import bisect
+import threading
+
+from config import config, DATA_FOLDER
+from ingredient_matching import normalize_ingredient
+from recipe_store import parse_file_number
+from storage import write_file_atomic
+
+# The index is kept outside the recipes folder, writing it must not change the folder's mtime
+RECIPE_FOLDER = config.get("RECIPES_FOLDER")
+RECIPE_SEARCH_INDEX_FILE = config.get("RECIPE_SEARCH_INDEX_FILE", os.path.join(DATA_FOLDER, "recipe_search_index.json"))
+
+# Facets that can be filtered with 'name:value', mapped to the line prefix in a saved recipe file
+FACET_PREFIXES = {
+    'meal': 'Maaltijdtype:',
+    'dish': 'Gerechtstype:',
+    'cuisine': 'Keukentype:',
+}
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+QUERY_TOKEN_PATTERN = re.compile(r"\(|\)|[<>]=?|=|[^\s()<>=]+")
+RECIPE_SEARCH_RESCAN_INTERVAL = config.get_float("RECIPE_SEARCH_RESCAN_INTERVAL", 60)  # Seconds between checks of every file
+INDEX_VERSION = 1
+TERM_BITMAP_CACHE_SIZE = 256
+
+
+def tokenize(text):
+    """Split text into normalized search terms (lowercase, singular, synonyms mapped)."""
+    return {normalize_ingredient(word) for word in WORD_PATTERN.findall(text.casefold())}
+
+
+def ids_to_bitmap(document_ids):
+    """Build a bitmap out of document ids in one go (OR-ing bits one by one is quadratic)."""
+    document_ids = list(document_ids)
+    if not document_ids:
+        return 0
+    bits = bytearray(max(document_ids) // 8 + 1)
+    for document_id in document_ids:
+        bits[document_id >> 3] |= 1 << (document_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitmap_to_ids(bitmap):
+    """Return the ids of the bits that are set in a bitmap, lowest first."""
+    return [position for position, bit in enumerate(reversed(bin(bitmap)[2:])) if bit == '1']
+
+
+def parse_recipe_file(content):
+    """
+    Read the fields of a saved recipe file (see recipes.render_recipe_text).
+
+    Returns a dictionary with the label, the ingredient lines, the facet values per facet
+    and the calories (None when missing).
+    """
+    document = {'label': '', 'ingredients': [], 'facets': {facet: [] for facet in FACET_PREFIXES}, 'calories': None}
+    for line in content.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('Recept:'):
+            document['label'] = stripped[len('Recept:'):].strip()
+        elif stripped.startswith('- '):
+            document['ingredients'].append(stripped[2:])
+        elif stripped.startswith('Calorieën:'):
+            try:
+                document['calories'] = float(stripped[len('Calorieën:'):].strip())
+            except ValueError:
+                pass
+        else:
+            for facet, prefix in FACET_PREFIXES.items():
+                if stripped.startswith(prefix):
+                    values = stripped[len(prefix):].split(',')
+                    document['facets'][facet] = [value.strip().casefold() for value in values if value.strip()]
+    return document
+
+
+class RecipeSearchIndex:
+    """
+    Full-text and faceted search over the saved recipe files.
+
+    Every file is a document with a numeric id. Terms (label, ingredient lines and type
+    values) map to sorted posting lists of document ids; the few facet values map to
+    bitmaps: Python integers where bit n is set when document n matches. While a query is
+    evaluated every posting list is turned into a bitmap too, so AND/OR/NOT are plain &,
+    | and ~ on integers. Calories are kept per document for range filters.
+
+    The index is stored as JSON in the data folder. refresh() compares the modification
+    time of every file in one os.scandir pass and only reads files that are new or that
+    changed; the folder's own modification time tells whether files can have been added
+    or removed. That pass is skipped while the folder did not change, unless a save was
+    reported with invalidate() or the last pass is older than RECIPE_SEARCH_RESCAN_INTERVAL
+    (files edited in place are picked up then). The index is written once per refresh
+    that changed it. Deleted and
+    re-indexed documents are cleared from the 'alive' bitmap and the index is rebuilt
+    once too many of them pile up.
+    """
+
+    def __init__(self, recipe_folder, index_file):
+        self.recipe_folder = recipe_folder
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_scan = None  # time.monotonic() of the last full pass over the files
+        self._reset()
+
+    def _reset(self):
+        """Start with an empty index."""
+        self.folder_mtime = None
+        self.documents = []  # Document id -> {'file_name', 'mtime', 'label', 'calories'}
+        self.file_ids = {}  # File name -> live document id
+        self.terms = {}  # Term -> sorted list of document ids
+        self.facets = {facet: {} for facet in FACET_PREFIXES}  # Facet -> value -> bitmap
+        self.alive = 0
+        self._clear_caches()
+
+    def _clear_caches(self):
+        """Forget the data derived from the index (needed after every change)."""
+        self._term_bitmaps = {}  # Term -> bitmap, for the most recently queried terms
+        self._calorie_order = None  # (sorted calories, document ids in the same order)
+
+    #------------------------------------------
+    # Persistence
+    #------------------------------------------
+
+    def _load(self):
+        """Read the stored index when it exists and matches the current format."""
+        self._loaded = True
+        if not os.path.isfile(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+
+        # Bitmaps are stored as hexadecimal strings, huge integers are not valid JSON numbers everywhere
+        self.folder_mtime = data['folder_mtime']
+        self.documents = data['documents']
+        self.terms = data['terms']
+        self.facets = {
+            facet: {value: int(bitmap, 16) for value, bitmap in values.items()}
+            for facet, values in data['facets'].items()
+        }
+        self.alive = int(data['alive'], 16)
+        self._clear_caches()
+        self.file_ids = {
+            document['file_name']: document_id
+            for document_id, document in enumerate(self.documents)
+            if self.alive >> document_id & 1
+        }
+
+    def _save(self):
+        """Write the index to disk (atomically, so a crash never leaves half an index)."""
+        data = {
+            'version': INDEX_VERSION,
+            'folder_mtime': self.folder_mtime,
+            'documents': self.documents,
+            'terms': self.terms,
+            'facets': {
+                facet: {value: format(bitmap, 'x') for value, bitmap in values.items()}
+                for facet, values in self.facets.items()
+            },
+            'alive': format(self.alive, 'x'),
+        }
+        folder = os.path.dirname(self.index_file)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        # json.dumps uses the C encoder, json.dump does not
+        write_file_atomic(self.index_file, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+    #------------------------------------------
+    # Indexing
+    #------------------------------------------
+
+    def _add_document(self, file_name, mtime, content, postings):
+        """
+        Index the content of one recipe file as a new document.
+
+        The document id is collected in postings ({(facet or None, term): [ids]}); the
+        bitmaps are only updated once per refresh by _merge_postings.
+        """
+        document = parse_recipe_file(content)
+        document_id = len(self.documents)
+
+        terms = tokenize(document['label'])
+        for line in document['ingredients']:
+            terms |= tokenize(line)
+        for facet, values in document['facets'].items():
+            for value in values:
+                # Both the whole value ('lunch/dinner') and its words ('lunch', 'dinner') can be filtered on
+                value_terms = tokenize(value)
+                terms |= value_terms
+                for key in value_terms | {value}:
+                    postings.setdefault((facet, key), []).append(document_id)
+        for term in terms:
+            postings.setdefault((None, term), []).append(document_id)
+
+        self.documents.append({
+            'file_name': file_name,
+            'number': parse_file_number(file_name),
+            'mtime': mtime,
+            'label': document['label'],
+            'calories': document['calories'],
+        })
+        self.file_ids[file_name] = document_id
+
+    def _merge_postings(self, postings):
+        """Add the collected document ids to the term posting lists and the facet bitmaps."""
+        for (facet, key), document_ids in postings.items():
+            if facet is None:
+                # New documents always get higher ids, so the lists stay sorted
+                self.terms.setdefault(key, []).extend(document_ids)
+            else:
+                self.facets[facet][key] = self.facets[facet].get(key, 0) | ids_to_bitmap(document_ids)
+
+    def _remove_document(self, file_name):
+        """Drop the live document of a file (its bits stay in the bitmaps, but no longer count)."""
+        document_id = self.file_ids.pop(file_name, None)
+        if document_id is not None:
+            self.alive &= ~(1 << document_id)
+
+    def invalidate(self):
+        """Report that a recipe file was written, the next refresh checks every file."""
+        with self._lock:
+            self._last_scan = None
+
+    def refresh(self, full=False):
+        """
+        Bring the index up to date with the recipe folder. Returns the number of (re)indexed files.
+
+        Only the folder's modification time is checked, unless full is set, a save was
+        reported or the last check of every file is too old.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            # Editing a file in place does not change the folder, adding or removing one does
+            folder_mtime = os.stat(self.recipe_folder).st_mtime_ns
+            folder_changed = folder_mtime != self.folder_mtime
+            now = time.monotonic()
+            scan_expired = self._last_scan is None or now - self._last_scan >= RECIPE_SEARCH_RESCAN_INTERVAL
+            if not (full or folder_changed or scan_expired):
+                return 0
+
+            # Too many dead documents make every bitmap longer than needed: start over
+            if len(self.documents) > 2 * max(len(self.file_ids), 100):
+                self._reset()
+
+            changed = 0
+            postings = {}
+            current_files = set()
+            with os.scandir(self.recipe_folder) as entries:
+                for entry in entries:
+                    if parse_file_number(entry.name) is None or not entry.is_file():
+                        continue
+                    current_files.add(entry.name)
+                    mtime = entry.stat().st_mtime_ns
+                    document_id = self.file_ids.get(entry.name)
+                    if document_id is not None and self.documents[document_id]['mtime'] == mtime:
+                        continue
+
+                    self._remove_document(entry.name)
+                    with open(entry.path, 'r') as file:
+                        self._add_document(entry.name, mtime, file.read(), postings)
+                    changed += 1
+
+            if folder_changed:
+                for file_name in set(self.file_ids) - current_files:
+                    self._remove_document(file_name)
+                    changed += 1
+            self.folder_mtime = folder_mtime
+            self._last_scan = now
+
+            if changed:
+                self._merge_postings(postings)
+                self.alive = ids_to_bitmap(self.file_ids.values())
+                self._clear_caches()
+                self._save()
+            return changed
+
+    #------------------------------------------
+    # Searching
+    #------------------------------------------
+
+    def search(self, query):
+        """
+        Return the documents matching a query, ordered by file number.
+
+        Terms are combined with AND (also when no operator is given), OR and NOT, with
+        parentheses for grouping. 'meal:dinner', 'dish:soup' and 'cuisine:italian' filter
+        on a facet, and 'calories < 600' (<, <=, >, >=, =) filters on calories. Example:
+        'chicken AND dinner AND calories < 600'. Raises ValueError for an invalid query.
+        """
+        self.refresh()
+        with self._lock:
+            tokens = QUERY_TOKEN_PATTERN.findall(query)
+            if not tokens:
+                return []
+            parser = _QueryParser(tokens, self)
+            bitmap = parser.parse() & self.alive
+
+            results = [self.documents[document_id] for document_id in bitmap_to_ids(bitmap)]
+        return sorted(results, key=lambda document: document['number'])
+
+    def term_bitmap(self, term):
+        """Return the bitmap of the documents containing all words of a term."""
+        bitmap = self.alive
+        for word in tokenize(term):
+            word_bitmap = self._term_bitmaps.get(word)
+            if word_bitmap is None:
+                if len(self._term_bitmaps) >= TERM_BITMAP_CACHE_SIZE:
+                    self._term_bitmaps.clear()
+                word_bitmap = self._term_bitmaps[word] = ids_to_bitmap(self.terms.get(word, ()))
+            bitmap &= word_bitmap
+        return bitmap
+
+    def facet_bitmap(self, facet, value):
+        """Return the bitmap of the documents with the given facet value."""
+        if facet not in self.facets:
+            raise ValueError(f"Onbekend filter '{facet}', gebruik {', '.join(FACET_PREFIXES)}.")
+        values = self.facets[facet]
+        if value.casefold() in values:
+            return values[value.casefold()]
+
+        words = tokenize(value)
+        if not words:
+            raise ValueError(f"Geef een waarde voor het filter '{facet}', bijvoorbeeld '{facet}:waarde'.")
+        bitmap = self.alive
+        for word in words:
+            bitmap &= values.get(word, 0)
+        return bitmap
+
+    def calories_bitmap(self, operator, limit):
+        """Return the bitmap of the documents whose calories compare to limit with operator."""
+        if self._calorie_order is None:
+            pairs = sorted(
+                (self.documents[document_id]['calories'], document_id)
+                for document_id in self.file_ids.values()
+                if self.documents[document_id]['calories'] is not None
+            )
+            self._calorie_order = ([calories for calories, _ in pairs], [document_id for _, document_id in pairs])
+        calories, document_ids = self._calorie_order
+
+        # The calories are sorted, so every comparison is a slice found by binary search
+        if operator == '<':
+            selected = document_ids[:bisect.bisect_left(calories, limit)]
+        elif operator == '<=':
+            selected = document_ids[:bisect.bisect_right(calories, limit)]
+        elif operator == '>':
+            selected = document_ids[bisect.bisect_right(calories, limit):]
+        elif operator == '>=':
+            selected = document_ids[bisect.bisect_left(calories, limit):]
+        else:
+            selected = document_ids[bisect.bisect_left(calories, limit - 0.5):bisect.bisect_left(calories, limit + 0.5)]
+        return ids_to_bitmap(selected)
+
+
+class _QueryParser:
+    """Recursive descent parser for search queries: OR binds weaker than AND, NOT binds strongest."""
+
+    def __init__(self, tokens, index):
+        self.tokens = tokens
+        self.position = 0
+        self.index = index
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError("Onvolledige zoekopdracht.")
+        self.position += 1
+        return token
+
+    def parse(self):
+        bitmap = self._parse_or()
+        if self._peek() is not None:
+            raise ValueError(f"Onverwacht '{self._peek()}' in de zoekopdracht.")
+        return bitmap
+
+    def _parse_or(self):
+        bitmap = self._parse_and()
+        while self._peek() is not None and self._peek().upper() == 'OR':
+            self._next()
+            bitmap |= self._parse_and()
+        return bitmap
+
+    def _parse_and(self):
+        bitmap = self._parse_not()
+        while self._peek() is not None and self._peek() != ')' and self._peek().upper() != 'OR':
+            if self._peek().upper() == 'AND':
+                self._next()
+            bitmap &= self._parse_not()
+        return bitmap
+
+    def _parse_not(self):
+        if self._peek() is not None and self._peek().upper() == 'NOT':
+            self._next()
+            return self.index.alive & ~self._parse_not()
+        return self._parse_term()
+
+    def _parse_term(self):
+        token = self._next()
+        if token == '(':
+            bitmap = self._parse_or()
+            if self._next() != ')':
+                raise ValueError("Ontbrekend ')' in de zoekopdracht.")
+            return bitmap
+        if token.casefold() in ('calories', 'calorieën', 'kcal') and self._peek() in ('<', '<=', '>', '>=', '='):
+            operator = self._next()
+            try:
+                limit = float(self._next())
+            except ValueError:
+                raise ValueError("Verwacht een getal na het aantal calorieën.") from None
+            return self.index.calories_bitmap(operator, limit)
+        if ':' in token:
+            facet, value = token.split(':', 1)
+            return self.index.facet_bitmap(facet.casefold(), value)
+        return self.index.term_bitmap(token)
+
+
+# Shared search index over the saved recipes
+recipe_search_index = RecipeSearchIndex(RECIPE_FOLDER, RECIPE_SEARCH_INDEX_FILE)
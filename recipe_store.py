@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+import time
+
+from config import config, DATA_FOLDER
+
+# Saved recipes live in the recipes folder. The manifest database is kept in the data folder:
+# its writes (and those of its journal) must not change the recipes folder's mtime
+RECIPE_FOLDER = config.get("RECIPES_FOLDER")
+RECIPE_STORE_FILE = config.get("RECIPE_STORE_FILE", os.path.join(DATA_FOLDER, "recipes.db"))
+LEGACY_RECIPE_STORE_FILE = os.path.join(RECIPE_FOLDER or "recipes", "recipes.db")
+SQLITE_SUFFIXES = ('', '-journal', '-wal', '-shm')
+
+
+def parse_file_number(file_name):
+    """Return the number of a '<number> - <label>.txt' file name, or None for other files."""
+    if not file_name.endswith('.txt'):
+        return None
+    file_prefix = file_name.split(' - ')[0]
+    return int(file_prefix) if file_prefix.isdigit() else None
+
+
+class RecipeStore:
+    """
+    Manifest of the saved recipes, backed by SQLite.
+
+    Every saved recipe gets an id from a monotonic counter and its full structured recipe
+    is kept next to the rendered '<id> - <label>.txt' file. The next id, the list of saved
+    recipes and a recipe by id are answered from the database, without listing the folder.
+    Files saved before the manifest existed are imported once when it is created. A
+    manifest at legacy_file (its old place in the recipes folder) is moved on first use.
+    """
+
+    def __init__(self, file_path, recipe_folder, legacy_file=None):
+        self.file_path = file_path
+        self.recipe_folder = recipe_folder
+        self.legacy_file = legacy_file
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open (and on first use create and seed) the manifest database."""
+        if self._connection is None:
+            folder = os.path.dirname(self.file_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            self._move_legacy_file()
+            # isolation_level=None: transactions are started explicitly with BEGIN IMMEDIATE
+            connection = sqlite3.connect(self.file_path, check_same_thread=False, isolation_level=None)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS saved_recipes ("
+                "id INTEGER PRIMARY KEY, file_name TEXT NOT NULL, label TEXT NOT NULL, data TEXT, saved_at REAL)"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("SELECT value FROM counter WHERE name = 'next_id'").fetchone() is None:
+                self._import_existing_files(connection)
+            connection.execute("COMMIT")
+            self._connection = connection
+        return self._connection
+
+    def _move_legacy_file(self):
+        """Move the manifest (and its journal) from its old place, unless there already is one."""
+        if (not self.legacy_file or os.path.exists(self.file_path)
+                or os.path.abspath(self.legacy_file) == os.path.abspath(self.file_path)):
+            return
+        if os.path.exists(self.legacy_file):
+            for suffix in SQLITE_SUFFIXES:
+                if os.path.exists(self.legacy_file + suffix):
+                    shutil.move(self.legacy_file + suffix, self.file_path + suffix)
+
+    def _import_existing_files(self, connection):
+        """Add the recipe files that were saved before the manifest existed (one folder scan)."""
+        last_id = 0
+        if self.recipe_folder and os.path.isdir(self.recipe_folder):
+            for file_name in os.listdir(self.recipe_folder):
+                file_number = parse_file_number(file_name)
+                if file_number is None:
+                    continue
+                label = file_name[:-len('.txt')].split(' - ', 1)[-1]
+                connection.execute(
+                    "INSERT OR IGNORE INTO saved_recipes (id, file_name, label, data, saved_at) VALUES (?, ?, ?, NULL, ?)",
+                    (file_number, file_name, label, os.path.getmtime(os.path.join(self.recipe_folder, file_name)))
+                )
+                last_id = max(last_id, file_number)
+        connection.execute("INSERT INTO counter (name, value) VALUES ('next_id', ?)", (last_id + 1,))
+
+    def next_id(self):
+        """Return the id the next saved recipe will get."""
+        with self._lock:
+            connection = self._connect()
+            return connection.execute("SELECT value FROM counter WHERE name = 'next_id'").fetchone()[0]
+
+    def save(self, recipe, content):
+        """
+        Save a recipe: claim the next id, record it in the manifest and write the text file.
+
+        Returns the file name. The id is claimed in a write transaction, so two processes
+        saving at the same moment never get the same number.
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                recipe_id = connection.execute("SELECT value FROM counter WHERE name = 'next_id'").fetchone()[0]
+                file_name = f"{recipe_id} - {recipe['label']}.txt"
+                connection.execute(
+                    "INSERT INTO saved_recipes (id, file_name, label, data, saved_at) VALUES (?, ?, ?, ?, ?)",
+                    (recipe_id, file_name, recipe['label'], json.dumps(dict(recipe)), time.time())
+                )
+                connection.execute("UPDATE counter SET value = ? WHERE name = 'next_id'", (recipe_id + 1,))
+
+                with open(os.path.join(self.recipe_folder, file_name), 'w') as file:
+                    file.write(content)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return file_name
+
+    def list_saved(self):
+        """Return (id, label, file_name) for every saved recipe, ordered by id."""
+        with self._lock:
+            connection = self._connect()
+            return connection.execute("SELECT id, label, file_name FROM saved_recipes ORDER BY id").fetchall()
+
+    def get(self, recipe_id):
+        """
+        Return the saved recipe with the given id as a dictionary, or None when it does not exist.
+
+        The dictionary holds 'id', 'label', 'file_name' and 'recipe' (the structured recipe,
+        None for files that were saved before the manifest existed).
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT id, label, file_name, data FROM saved_recipes WHERE id = ?", (recipe_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'label': row[1], 'file_name': row[2], 'recipe': json.loads(row[3]) if row[3] else None}
+
+
+# Shared store for the saved recipes
+recipe_store = RecipeStore(RECIPE_STORE_FILE, RECIPE_FOLDER, LEGACY_RECIPE_STORE_FILE)
@@ -1,16 +1,46 @@
 import os
-from dotenv import load_dotenv
-from edamam_api import get_random_recipe, get_recipe_based_on_fridge
-from open_weather_api import get_weather, select_recipe_type_by_weather
+import random
+from concurrent import futures
+from functools import partial
+import requests
+from config import config
+from edamam_api import (get_recipe_based_on_fridge, get_recipes_based_on_fridge, get_recipe_page_with_source,
+                        schedule_recipe_page, FROM_EDAMAM)
+from http_client import RequestError
+from recipe_prefetch import recipe_prefetcher, PREFETCH_PAGE_SIZE
+from request_scheduler import edamam_scheduler, INTERACTIVE, EDAMAM_QUEUE_TIMEOUT
+from offline import is_offline
+from seen_recipes import seen_recipes
+from meal_planner import MEAL_PLAN_MEALS, MEAL_PLAN_POOL_SIZE, plan_meals
+from recipe_ranking import rank_recipes
+from recipe_index import recipe_index
+from recipe_store import recipe_store
+from recipe_search import recipe_search_index
+from open_weather_api import get_weather, get_recipe_type_for_weather, predict_recipe_types
 from helper_functions import colored_text, colored_input
 from shopping_list import add_recipe_ingredients_to_shopping_list
 
-from fridge import get_fridge_contents
-
-load_dotenv()
+from fridge import get_fridge_contents, fridge_repository
+from ingredient_matching import find_missing_ingredients
 
 # Define recipes folder
-RECIPE_FOLDER = os.getenv("RECIPES_FOLDER")
+RECIPE_FOLDER = config.get("RECIPES_FOLDER")
+
+# Number of best matching recipes the user can choose from
+BEST_MATCH_TOP_K = config.get_int("BEST_MATCH_TOP_K", 5)
+
+# Minimal fraction of ingredients in the fridge for a local recipe to be used without asking Edamam
+LOCAL_MATCH_MIN_COVERAGE = config.get_float("LOCAL_MATCH_MIN_COVERAGE", 0.8)
+
+# Number of recipe types fetched speculatively while the weather is still being looked up
+SPECULATIVE_RECIPE_TYPES = config.get_int("SPECULATIVE_RECIPE_TYPES", 2)
+
+# Pages of random recipes per category, requested so recipes that were already shown can be skipped
+NO_REPEAT_PAGE_SIZE = config.get_int("NO_REPEAT_PAGE_SIZE", 20)
+NO_REPEAT_MAX_PAGES = config.get_int("NO_REPEAT_MAX_PAGES", 3)  # Pages tried before a repeat is accepted
+
+# List of possible search queries to vary the results because there is no random option in the API without using a query
+RANDOM_RECIPE_CATEGORIES = ['chicken', 'beef', 'vegetarian', 'pasta', 'soup', 'cake', 'salad', 'fish', 'pizza', 'breakfast']
 
 #------------------------------------------
 # Folder/file functions
@@ -18,39 +48,18 @@ RECIPE_FOLDER = os.getenv("RECIPES_FOLDER")
 
 
 def get_next_file_number():
-    """Get the current file number by checking existing files"""
-    #Get a list of the files in the recipe folder
-    files = os.listdir(RECIPE_FOLDER)
-
-    # Initialize an empty list to store the numbers
-    numbers = []
-    # Loop through each file in the list of files
-    for file in files:
-        # Check if the file ends with '.txt' and the part before ' - ' is a digit
-        if file.endswith('.txt'):
-            # Split the file name at ' - ' and get the first part
-            file_prefix = file.split(' - ')[0]
-
-            # Check if the first part is a digit
-            if file_prefix.isdigit():
-                # Convert the first part to an integer and add it to the list of numbers
-                numbers.append(int(file_prefix))
-
-    return max(numbers, default=0) + 1
-
-def save_recipe_to_file(recipe, file_number):
-    """Save recipe and its instructions to a text file"""
-    recipe_name = recipe['label']
-    file_name = f"{file_number} - {recipe_name}.txt"
-    file_path = os.path.join(RECIPE_FOLDER, file_name)
+    """Get the number the next saved recipe file will get (from the recipe store, no folder scan)"""
+    return recipe_store.next_id()
 
+def render_recipe_text(recipe):
+    """Return the text that is written to the file of a saved recipe"""
     # Recipe details
     meal_type = recipe.get('mealType', ['Onbekend'])
     dish_type = recipe.get('dishType', ['Onbekend'])
     cuisine_type = recipe.get('cuisineType', ['Onbekend'])
 
     # Recipe content
-    recipe_content = (
+    return (
         f"Recept: {recipe['label']}\n"
         f"Bron: {recipe['source']}\n"
         f"Link naar recept: {recipe['url']}\n\n"
@@ -61,19 +70,63 @@ def save_recipe_to_file(recipe, file_number):
         f"\n\nCalorieën: {recipe['calories']:.2f}\n"
     )
 
-    # Save to file
-    with open(file_path, 'w') as file:
-        file.write(recipe_content)
-
+def save_recipe_to_file(recipe):
+    """Save recipe and its instructions to a text file, and the full recipe in the recipe store"""
+    file_name = recipe_store.save(recipe, render_recipe_text(recipe))
+    recipe_search_index.invalidate()
     print(f"Opgeslagen als: {file_name}")
 
 def prompt_save_recipe(recipe):
     """Prompt user to save the recipe if they choose to"""
-    file_number = get_next_file_number()
     save_recipe_check = colored_input("\nWilt u dit recept opslaan als bestand? (ja/nee) ", "magenta")
 
     if save_recipe_check.lower() == 'ja':
-        save_recipe_to_file(recipe, file_number)
+        save_recipe_to_file(recipe)
+
+def show_saved_recipes():
+    """List the saved recipes and show the details of the one the user picks"""
+    saved_recipes = recipe_store.list_saved()
+    if not saved_recipes:
+        print("Er zijn nog geen recepten opgeslagen.")
+        return
+
+    print("Opgeslagen recepten:")
+    for recipe_id, label, _ in saved_recipes:
+        print(f"{recipe_id} - {label}")
+
+    choice = colored_input("\nKies een recept (of x om terug te gaan): ", "magenta").lower()
+    if choice == 'x':
+        return
+
+    saved_recipe = recipe_store.get(int(choice)) if choice.isdigit() else None
+    if saved_recipe is None:
+        colored_text("Ongeldige invoer, probeer het opnieuw.", "red")
+    elif saved_recipe['recipe'] is not None:
+        print_recipe_details(saved_recipe['recipe'])
+    else:
+        # Recipes saved before the recipe store existed only have their text file
+        with open(os.path.join(RECIPE_FOLDER, saved_recipe['file_name']), 'r') as file:
+            print(file.read())
+
+def search_saved_recipes():
+    """Search the saved recipes on words, facets (meal:, dish:, cuisine:) and calories"""
+    colored_text("Voorbeeld: chicken AND dinner AND calories < 600 (filters: meal:, dish:, cuisine:)", "yellow")
+    query = colored_input("Zoekopdracht: ", "magenta")
+
+    try:
+        results = recipe_search_index.search(query)
+    except ValueError as e:
+        colored_text(f"Ongeldige zoekopdracht: {e}", "red")
+        return
+
+    if not results:
+        print("Geen opgeslagen recepten gevonden.")
+        return
+
+    print(f"{len(results)} recept(en) gevonden:")
+    for document in results:
+        calories = f"{document['calories']:.0f} kcal" if document['calories'] is not None else "onbekend"
+        print(f"- {document['file_name'][:-len('.txt')]} ({calories})")
 
 def add_recipe_to_shopping_list(ingredients):
     # Vraag de gebruiker om bevestiging of ze de missende ingrediënten willen toevoegen aan het boodschappenlijstje
@@ -88,13 +141,87 @@ def add_recipe_to_shopping_list(ingredients):
 # Recipes functions
 #------------------------------------------
 
+def get_recipe_for_category(category, seen=seen_recipes):
+    """
+    Return a recipe for the category that was not shown before, and record it as shown.
+
+    Prefetched recipes are used first, skipping the ones in seen. When none is left a page
+    of recipes is fetched live (see fetch_unseen_recipe()). Returns None when no recipes
+    were found, and raises RequestError when they could not be fetched.
+    """
+    skipped = 0
+    recipe = recipe_prefetcher.pop(category)
+    while recipe is not None and is_seen(recipe, seen):
+        skipped += 1
+        recipe = recipe_prefetcher.pop(category)
+
+    repeat = False
+    if recipe is None:
+        recipe, repeat, page_skipped = fetch_unseen_recipe(category, seen)
+        skipped += page_skipped
+
+    if recipe is not None:
+        if recipe.get('uri'):
+            seen.add(recipe['uri'])
+        seen.record_shown(repeat, skipped)
+    return recipe
+
+
+def is_seen(recipe, seen):
+    uri = recipe.get('uri')
+    return uri is not None and uri in seen
+
+
+def fetch_unseen_recipe(category, seen):
+    """
+    Fetch a page of random recipes and pick one that is not in seen.
+
+    A page of NO_REPEAT_PAGE_SIZE recipes almost always holds an unseen recipe. The other
+    unseen recipes go to the prefetch buffer, so the next recipe needs no request at all.
+    The first page may come from the recipe pool of the category, the next ones are
+    always requested fresh, so every page holds other recipes. Up to NO_REPEAT_MAX_PAGES
+    pages are tried; when all of them only hold seen recipes, a seen recipe is returned
+    after all. Only pages that were requested from Edamam count as page requests in
+    seen. Returns (recipe, repeat, skipped). Raises RequestError when a request fails
+    before any recipe was received.
+    """
+    fallback = None
+    skipped = 0
+    for page in range(NO_REPEAT_MAX_PAGES):
+        try:
+            recipes, source = get_recipe_page_with_source(category, 0, NO_REPEAT_PAGE_SIZE, INTERACTIVE,
+                                                          fresh=page > 0)
+        except RequestError:
+            if fallback is None:
+                raise
+            break
+
+        unseen = [recipe for recipe in recipes if not is_seen(recipe, seen)]
+        if source == FROM_EDAMAM:
+            seen.record_page(wasted=not unseen)
+        skipped += len(recipes) - len(unseen)
+        if unseen:
+            recipe = random.choice(unseen)
+            recipe_prefetcher.add(category, [other for other in unseen if other is not recipe])
+            return recipe, False, skipped
+        if fallback is None and recipes:
+            fallback = random.choice(recipes)
+
+    if fallback is None:
+        print("Geen recepten gevonden.")
+    return fallback, fallback is not None, skipped
+
+
 def generate_random_recipe():
     """Get a random recipe from the Edamam API"""
     colored_text("\nWillekeurig recept wordt gegenereerd....\n", "cyan")
 
-    # List of possible search queries to vary the results because there is no random option in the API without using a query
-    categories = ['chicken', 'beef', 'vegetarian', 'pasta', 'soup', 'cake', 'salad', 'fish', 'pizza', 'breakfast']
-    recipe = get_random_recipe(categories)
+    category = random.choice(RANDOM_RECIPE_CATEGORIES)
+    try:
+        recipe = get_recipe_for_category(category)
+    except RequestError as e:
+        print(f"Er is iets mis gegaan tijdens het ophalen van de recepten: {e}")
+        return
 
     if recipe:
         #Give the recipe details in the terminal
@@ -113,44 +240,146 @@ def make_recipe_from_fridge():
     colored_text("\nRecept op basis van koelkast voorraad wordt gegenereerd....\n", "cyan")
     fridge_ingredients = get_fridge_contents()
 
-    recipe = get_recipe_based_on_fridge(fridge_ingredients)
+    # Answer from the local corpus when it holds well covered recipes, otherwise ask Edamam
+    local_matches = get_good_local_matches(fridge_ingredients, BEST_MATCH_TOP_K)
+    if local_matches:
+        recipe = random.choice(local_matches)[0]
+    else:
+        recipe = get_recipe_based_on_fridge(fridge_ingredients)
     if recipe:
 
         recipe_ingredients = get_recipe_ingredients(recipe)
+        missing_ingredients = find_missing_ingredients(recipe_ingredients, fridge_repository.get_product_set())
 
-        # Initialize an empty list to store missing ingredients
-        missing_ingredients = []
-        # Iterate over each item in recipe_ingredients
-        for item in recipe_ingredients:
-            if item not in fridge_ingredients:
-                missing_ingredients.append(item)
-
-        print_recipe_details(recipe)
-        if not missing_ingredients:
-            colored_text("\nJe hebt alle producten in huis voor dit recept", "green")
-        else:
-            colored_text("\nLET OP: Je mist nog een aantal ingrediënten voor dit recept.", "yellow")
-            print("Missende ingrediënten:", ', '.join(missing_ingredients))
-
-            add_recipe_to_shopping_list(missing_ingredients)
+        show_recipe_with_missing_ingredients(recipe, missing_ingredients)
 
         prompt_save_recipe(recipe)
     else:
         print("Geen recept gevonden op basis van je koelkast inhoud. Zitten er producten in je koelkast?")
 
 
+def make_best_recipe_from_fridge():
+    """Fetch a page of candidate recipes in one request and let the user choose from the best matches."""
+    colored_text("\nBeste recepten op basis van koelkast voorraad worden gezocht....\n", "cyan")
+    fridge_ingredients = get_fridge_contents()
+    if not fridge_ingredients:
+        print("Geen recept gevonden op basis van je koelkast inhoud. Zitten er producten in je koelkast?")
+        return
+
+    best_matches = find_best_recipes_for_fridge(fridge_ingredients)
+    if not best_matches:
+        print("Geen recept gevonden op basis van je koelkast inhoud.")
+        return
+
+    print("Beste recepten voor jouw koelkast:")
+    for number, (recipe, coverage, missing) in enumerate(best_matches, start=1):
+        print(f"{number} - {recipe['label']} ({coverage:.0%} in huis, {len(missing)} missend)")
+
+    choice = colored_input("\nKies een recept (of x om terug te gaan): ", "magenta").lower()
+    if choice == 'x':
+        return
+    if not choice.isdigit() or not 1 <= int(choice) <= len(best_matches):
+        colored_text("Ongeldige invoer, probeer het opnieuw.", "red")
+        return
+
+    recipe, _, missing_ingredients = best_matches[int(choice) - 1]
+    show_recipe_with_missing_ingredients(recipe, missing_ingredients)
+    prompt_save_recipe(recipe)
+
+
+def find_best_recipes_for_fridge(fridge_ingredients, top_k=BEST_MATCH_TOP_K):
+    """Return the top_k (recipe, coverage, missing_ingredients) matches for the fridge, local ones first."""
+    # Only fetch candidates when the local corpus cannot fill the list with good matches
+    best_matches = get_good_local_matches(fridge_ingredients, top_k)
+    if len(best_matches) < top_k:
+        candidates = [recipe for recipe, _, _ in best_matches] + get_recipes_based_on_fridge(fridge_ingredients)
+        best_matches = rank_recipes(candidates, fridge_ingredients, top_k)
+    return best_matches
+
+
+def get_good_local_matches(fridge_ingredients, top_k):
+    """
+    Return the local recipe matches that cover at least LOCAL_MATCH_MIN_COVERAGE of their ingredients.
+
+    In offline mode every local match is good enough, as there is nothing else to offer.
+    """
+    if not fridge_ingredients:
+        return []
+    matches = recipe_index.find_recipes_for_fridge(fridge_ingredients, top_k)
+    min_coverage = 0 if is_offline() else LOCAL_MATCH_MIN_COVERAGE
+    return [match for match in matches if match[1] >= min_coverage]
+
+
+def get_meal_plan_candidates(fridge_ingredients, meal_count):
+    """
+    Return the candidate recipes for a meal plan: the best local matches for the fridge.
+
+    When the local corpus holds too few of them, one page of candidates is fetched from
+    Edamam as well (not in offline mode).
+    """
+    matches = recipe_index.find_recipes_for_fridge(fridge_ingredients, MEAL_PLAN_POOL_SIZE)
+    candidates = [recipe for recipe, _, _ in matches]
+    if len(candidates) < meal_count * 3 and fridge_ingredients and not is_offline():
+        candidates += get_recipes_based_on_fridge(fridge_ingredients)
+    return candidates
+
+
+def create_meal_plan(fridge_ingredients, meal_count=MEAL_PLAN_MEALS):
+    """Return a MealPlan of meal_count recipes that together need as few extra ingredients as possible."""
+    return plan_meals(get_meal_plan_candidates(fridge_ingredients, meal_count), fridge_ingredients, meal_count)
+
+
+def make_meal_plan():
+    """Plan the meals for the week and offer to put all missing ingredients on the shopping list at once."""
+    meal_count = colored_input(f"Hoeveel maaltijden wil je plannen? ({MEAL_PLAN_MEALS}): ", "magenta").strip()
+    if meal_count and (not meal_count.isdigit() or int(meal_count) < 1):
+        colored_text("Ongeldige invoer, probeer het opnieuw.", "red")
+        return
+
+    colored_text("\nWeekmenu wordt samengesteld....\n", "cyan")
+    meal_plan = create_meal_plan(get_fridge_contents(), int(meal_count) if meal_count else MEAL_PLAN_MEALS)
+    if not meal_plan.meals:
+        print("Geen recepten gevonden om een weekmenu mee te maken.")
+        return
+
+    for number, (recipe, missing) in enumerate(meal_plan.meals, start=1):
+        print(f"{number} - {recipe['label']} ({len(missing)} missend)")
+    print(f"\nGebruikt uit de koelkast: {', '.join(meal_plan.fridge_used) or 'niets'}")
+
+    if not meal_plan.missing_ingredients:
+        colored_text("\nJe hebt alle producten in huis voor dit weekmenu", "green")
+        return
+    print(f"Nog te kopen ({len(meal_plan.missing_ingredients)}): {', '.join(meal_plan.missing_ingredients)}")
+    add_recipe_to_shopping_list(meal_plan.missing_ingredients)
+
+
+def show_recipe_with_missing_ingredients(recipe, missing_ingredients):
+    """Print a recipe with its missing ingredients and offer to add those to the shopping list."""
+    print_recipe_details(recipe)
+    if not missing_ingredients:
+        colored_text("\nJe hebt alle producten in huis voor dit recept", "green")
+    else:
+        colored_text("\nLET OP: Je mist nog een aantal ingrediënten voor dit recept.", "yellow")
+        print("Missende ingrediënten:", ', '.join(missing_ingredients))
+
+        add_recipe_to_shopping_list(missing_ingredients)
+
+
 def generate_recipe_based_on_weather():
     """Generate recipe suggestions based on current weather in a city."""
     cityname = colored_input("Voer de plaatsnaam in: ", "magenta")
 
-    weather_data = get_weather(cityname)
+    weather_data, recipe_type = get_weather_with_speculative_recipes(cityname)
     if weather_data:
         temp = weather_data['main']['temp']
         weather_description = weather_data['weather'][0]['description']
-        recipe_type = select_recipe_type_by_weather(temp, weather_description)  # Pass both temp and weather_description
         print(f"Huidige weer in {cityname}: {weather_description}, Temperatuur: {temp}°C")
         print(f"Aanbevolen categorie eten is: {recipe_type}")
-        recipe = get_random_recipe(recipe_type)  # Assuming modification in get_random_recipe to accept recipe_type
+        try:
+            recipe = get_recipe_for_category(recipe_type)
+        except RequestError as e:
+            print(f"Er is iets mis gegaan tijdens het ophalen van de recepten: {e}")
+            return
         if recipe:
             #Print recipe details
             print_recipe_details(recipe)
@@ -166,6 +395,54 @@ def generate_recipe_based_on_weather():
     else:
         print("ER is een probleem opgetreden met het ophalen van de weer data.")
 
+def get_weather_with_speculative_recipes(city_name):
+    """
+    Look up the weather of a city while recipes for the likely recipe types are fetched in parallel.
+
+    The likely types come from the last known weather of the city. Their recipe pages are
+    queued on the Edamam scheduler with prefetch priority before the weather is requested,
+    so the recipe is usually ready as soon as the weather is known (one round trip instead
+    of two). The right guess is then moved up to interactive priority. Fetches for types
+    that turn out to be wrong are dropped while they are still queued, so they use no
+    quota, or their recipes are kept in the prefetch buffer when they were already sent.
+    Returns (weather_data, recipe_type), both None when the weather failed.
+    """
+    speculative_fetches = {}
+    for likely_type in predict_recipe_types(city_name, SPECULATIVE_RECIPE_TYPES):
+        # Nothing to win when recipes for this type are already waiting in the buffer
+        if recipe_prefetcher.buffered_count(likely_type) == 0:
+            speculative_fetches[likely_type] = schedule_recipe_page(likely_type, 0, PREFETCH_PAGE_SIZE)
+
+    weather_data = get_weather(city_name)
+    recipe_type = get_recipe_type_for_weather(weather_data) if weather_data else None
+
+    for likely_type, future in speculative_fetches.items():
+        if likely_type == recipe_type:
+            # The right guess: the user waits for it, so the recipe can be popped right away
+            edamam_scheduler.promote(future, INTERACTIVE)
+            buffer_speculative_recipes(likely_type, future)
+        elif not edamam_scheduler.cancel(future):
+            future.add_done_callback(partial(buffer_speculative_recipes, likely_type))
+
+    return weather_data, recipe_type
+
+def buffer_speculative_recipes(recipe_type, future):
+    """
+    Put the recipes of a speculative fetch in the prefetch buffer, waiting at most EDAMAM_QUEUE_TIMEOUT.
+
+    Failed requests are ignored, the recipe is then fetched the normal way. A fetch that
+    takes too long is dropped when it is still queued, or buffered once it is done.
+    """
+    try:
+        recipe_prefetcher.add(recipe_type, future.result(timeout=EDAMAM_QUEUE_TIMEOUT))
+    except futures.TimeoutError:
+        if not edamam_scheduler.cancel(future):
+            future.add_done_callback(partial(buffer_speculative_recipes, recipe_type))
+    except (futures.CancelledError, RequestError, requests.RequestException):
+        pass
+    except Exception as e:
+        print(f"Probleem met bufferen van recepten voor '{recipe_type}': {e!r}")
+
 def print_recipe_details(recipe):
     print(f"Recept: {recipe['label']}")
     print(f"Maaltijdtype: {', '.join(recipe.get('mealType', ['NVT']))}")
@@ -0,0 +1,300 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent import futures
+
+from config import config
+from http_client import RequestError
+from metrics import metrics
+
+# Quota of the Edamam plan; 0 turns the limiter off
+EDAMAM_RATE_LIMIT = config.get_float("EDAMAM_RATE_LIMIT", 10)  # Requests per minute
+EDAMAM_BURST = config.get_int("EDAMAM_BURST", 10)  # Requests that may be sent at once after an idle period
+EDAMAM_MAX_CONCURRENT = config.get_int("EDAMAM_MAX_CONCURRENT", 4)  # Requests in flight at the same time
+EDAMAM_QUEUE_TIMEOUT = config.get_float("EDAMAM_QUEUE_TIMEOUT", 30)  # Seconds an interactive caller waits
+EDAMAM_INTERACTIVE_RESERVE = config.get_float("EDAMAM_INTERACTIVE_RESERVE", 0.3)  # Share of the burst prefetches leave
+
+# Priorities, lower goes first
+INTERACTIVE = 0
+PREFETCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', PREFETCH: 'prefetch'}
+
+# Seconds over which the quota usage is counted
+QUOTA_WINDOW = 60
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    The bucket holds at most capacity tokens and gains rate tokens per second. Every request
+    takes one token, so short bursts up to capacity are allowed while the average stays at
+    the rate. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, reserve=0):
+        """
+        Take a token, but only when reserve tokens are left afterwards.
+
+        Returns 0 on success, otherwise the seconds until enough tokens are available.
+        """
+        if self.rate <= 0:
+            return 0
+        self._refill()
+        if self.tokens >= 1 + reserve:
+            self.tokens -= 1
+            return 0
+        return (1 + reserve - self.tokens) / self.rate
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server answered 429 Too Many Requests."""
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+
+class ScheduledRequest:
+    """A queued request together with the future that every coalesced caller waits on."""
+
+    def __init__(self, key, function, priority):
+        self.key = key
+        self.function = function
+        self.priority = priority
+        self.future = futures.Future()
+        self.started = False
+        self.cancelled = False
+        self.callers = 0
+        self.queued_at = time.monotonic()
+
+
+class RequestScheduler:
+    """
+    Sends the requests of one API at the rate of its quota.
+
+    Callers submit a request with a key and a priority and wait for its result. A dispatcher
+    thread takes a token from the bucket and then starts the queued request with the highest
+    priority, so interactive requests overtake prefetches that are still waiting. Prefetches
+    leave interactive_reserve of the burst in the bucket, so a burst of prefetches (e.g.
+    at startup) never makes the first interactive request wait for the refill. Requests
+    with the same key as one that is queued or in flight are not sent again: the callers
+    share the result of the first one. The requests run on a small worker pool, so a slow
+    response does not hold up the dispatching of the next request.
+
+    schedule() queues a request without waiting for it, e.g. for a speculative fetch.
+    Such a request can be dropped with cancel() as long as it has not been sent, so a
+    guess that turned out to be wrong does not use any quota.
+    """
+
+    def __init__(self, name, rate_per_minute, burst, max_concurrent=EDAMAM_MAX_CONCURRENT,
+                 interactive_reserve=EDAMAM_INTERACTIVE_RESERVE):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_minute / 60, burst)
+        self.max_concurrent = max_concurrent
+        # Tokens prefetches cannot take, at least one token is always left for them
+        self.reserved_tokens = min(self.bucket.capacity - 1, int(self.bucket.capacity * interactive_reserve))
+        self.stats = {'submitted': 0, 'coalesced': 0, 'sent': 0, 'failed': 0, 'rate_limited': 0, 'timeouts': 0,
+                      'cancelled': 0}
+        self._queue = []  # Heap of (priority, sequence number, ScheduledRequest)
+        self._pending = {}  # Key -> ScheduledRequest that is queued or in flight
+        self._in_flight = 0
+        self._sent_times = deque()  # Send times within the last QUOTA_WINDOW seconds
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = None
+        self._thread = None
+
+    def submit(self, key, function, priority=INTERACTIVE, timeout=None):
+        """
+        Run function() for the key within the quota and return its result.
+
+        Raises the exception of function(), or RequestError when an interactive request
+        waited longer than EDAMAM_QUEUE_TIMEOUT (prefetches wait as long as it takes). The
+        caller that gives up is dropped like with cancel(), so a request nobody waits for
+        any more is not sent.
+        """
+        if timeout is None and priority == INTERACTIVE:
+            timeout = EDAMAM_QUEUE_TIMEOUT
+
+        future = self.schedule(key, function, priority)
+        try:
+            return future.result(timeout)
+        except futures.TimeoutError as e:
+            with self._condition:
+                self.stats['timeouts'] += 1
+            self.cancel(future)
+            raise RequestError(f"{self.name} is te druk, probeer het later opnieuw") from e
+
+    def schedule(self, key, function, priority=PREFETCH):
+        """Queue function() for the key within the quota without waiting. Returns the future of its result."""
+        with self._condition:
+            self._start()
+            self.stats['submitted'] += 1
+            request = self._pending.get(key)
+            coalesced = request is not None
+            if coalesced:
+                self.stats['coalesced'] += 1
+                # A waiting interactive caller moves a queued prefetch of the same query up
+                self._raise_priority(request, priority)
+            else:
+                request = ScheduledRequest(key, function, priority)
+                self._pending[key] = request
+                heapq.heappush(self._queue, (priority, next(self._counter), request))
+            request.callers += 1
+            self._condition.notify()
+
+        if metrics.enabled:
+            metrics.increment('scheduler_requests_total', api=self.name, priority=PRIORITY_NAMES[priority],
+                              coalesced=coalesced)
+        return request.future
+
+    def promote(self, future, priority=INTERACTIVE):
+        """Move the queued request of a future from schedule() up to priority, e.g. once a user waits for it."""
+        with self._condition:
+            request = self._find_request(future)
+            if request is not None:
+                self._raise_priority(request, priority)
+                self._condition.notify()
+
+    def cancel(self, future):
+        """
+        Give up on the request of a future from schedule().
+
+        The request is dropped when it has not been sent yet and no other caller waits
+        for it. Returns True when it was dropped (the future is then cancelled), False
+        when it is sent anyway.
+        """
+        with self._condition:
+            request = self._find_request(future)
+            if request is None:
+                return False
+            request.callers -= 1
+            if request.started or request.callers > 0:
+                return False
+            request.cancelled = True
+            del self._pending[request.key]
+            self.stats['cancelled'] += 1
+        return request.future.cancel()
+
+    def get_stats(self):
+        """Return the request counters together with the quota usage of the last minute."""
+        with self._condition:
+            self._forget_old_sends(time.monotonic())
+            stats = dict(self.stats)
+            stats['queued'] = sum(1 for request in self._pending.values() if not request.started)
+            stats['in_flight'] = len(self._pending) - stats['queued']
+            stats['sent_last_minute'] = len(self._sent_times)
+            stats['quota_per_minute'] = self.bucket.rate * 60 or None
+            stats['reserved_for_interactive'] = self.reserved_tokens
+        return stats
+
+    def _start(self):
+        """Start the dispatcher and the worker pool on first use. Condition must be held."""
+        if self._thread is None:
+            self._executor = futures.ThreadPoolExecutor(self.max_concurrent, thread_name_prefix=f"{self.name}-request")
+            self._thread = threading.Thread(target=self._dispatch, name=f"{self.name}-scheduler", daemon=True)
+            self._thread.start()
+
+    def _find_request(self, future):
+        """Return the queued or in-flight request of a future, None when it finished. Condition must be held."""
+        for request in self._pending.values():
+            if request.future is future:
+                return request
+        return None
+
+    def _raise_priority(self, request, priority):
+        """Queue a request that was not sent yet again with a higher priority. Condition must be held."""
+        if not request.started and priority < request.priority:
+            request.priority = priority
+            heapq.heappush(self._queue, (priority, next(self._counter), request))
+
+    def _forget_old_sends(self, now):
+        """Drop the send times that fell out of the quota window. Condition must be held."""
+        while self._sent_times and self._sent_times[0] <= now - QUOTA_WINDOW:
+            self._sent_times.popleft()
+
+    def _peek_request(self):
+        """Return the queued request with the highest priority, dropping stale heap entries. Condition must be held."""
+        while self._queue:
+            _, _, request = self._queue[0]
+            if not request.started and not request.cancelled:
+                return request
+            heapq.heappop(self._queue)
+        return None
+
+    def _can_dispatch(self):
+        """Return True when a request is queued and a worker is free. Condition must be held."""
+        if self._in_flight >= self.max_concurrent:
+            return False
+        return any(not request.started for request in self._pending.values())
+
+    def _dispatch(self):
+        """Start the queued requests one by one, as fast as the bucket allows."""
+        while True:
+            with self._condition:
+                while not self._can_dispatch():
+                    self._condition.wait()
+
+                request = self._peek_request()
+                delay = self.bucket.try_acquire(self.reserved_tokens if request.priority > INTERACTIVE else 0)
+                if delay:
+                    # Woken early by a new request, the wait is simply checked again
+                    self._condition.wait(delay)
+                    continue
+
+                heapq.heappop(self._queue)
+                request.started = True
+                self._in_flight += 1
+                now = time.monotonic()
+                self._sent_times.append(now)
+                self._forget_old_sends(now)
+                self.stats['sent'] += 1
+
+            if metrics.enabled:
+                metrics.observe('scheduler_wait_seconds', now - request.queued_at, api=self.name,
+                                priority=PRIORITY_NAMES[request.priority])
+            self._executor.submit(self._run, request)
+
+    def _run(self, request):
+        """Run a request and hand its result to every caller waiting for it."""
+        try:
+            result = request.function()
+        except Exception as e:
+            with self._condition:
+                self.stats['failed'] += 1
+                if isinstance(e, RequestError) and e.status_code == 429:
+                    # The server says the quota is used up, so stop sending for a while
+                    self.stats['rate_limited'] += 1
+                    self.bucket.drain()
+                self._finish(request)
+            request.future.set_exception(e)
+        else:
+            with self._condition:
+                self._finish(request)
+            request.future.set_result(result)
+
+    def _finish(self, request):
+        """Forget a request that completed and let the dispatcher start the next one. Condition must be held."""
+        del self._pending[request.key]
+        self._in_flight -= 1
+        self._condition.notify()
+
+
+# Shared scheduler for all Edamam requests
+edamam_scheduler = RequestScheduler('edamam', EDAMAM_RATE_LIMIT, EDAMAM_BURST)
+
+
+def get_scheduler_stats():
+    """Return the request counters and quota usage of the Edamam scheduler."""
+    return edamam_scheduler.get_stats()
@@ -0,0 +1,214 @@
+import os
+import math
+import struct
+import threading
+
+from config import config, DATA_FOLDER
+from metrics import metrics
+from storage import file_lock, write_file_atomic
+
+# Location and size of the record of recipes already shown
+SEEN_RECIPES_FILE = config.get("SEEN_RECIPES_FILE", os.path.join(DATA_FOLDER, "seen_recipes.bin"))
+SEEN_RECIPES_CAPACITY = config.get_int("SEEN_RECIPES_CAPACITY", 5000)  # Recipes per generation
+SEEN_RECIPES_ERROR_RATE = config.get_float("SEEN_RECIPES_ERROR_RATE", 0.01)  # Unseen recipes reported as seen
+
+# File header: magic, number of bits, number of hashes, number of the current generation (rotations so far),
+# items in the current and in the previous generation
+HEADER = struct.Struct('<4sIIIII')
+MAGIC = b'FCS2'
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings.
+
+    A Bloom filter answers "maybe seen" or "certainly not seen" with a fixed number of bits,
+    whatever the length of the keys. The k bit positions of a key are derived from one
+    BLAKE2b digest with double hashing.
+    """
+
+    def __init__(self, bit_count, hash_count, bits=None):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bytearray(bits) if bits is not None else bytearray((bit_count + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        """Create a filter that holds capacity keys with the given false positive rate."""
+        bit_count = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(bit_count / capacity * math.log(2)))
+        return cls(bit_count, hash_count)
+
+    def _positions(self, key):
+        # Imported on first use, loading OpenSSL would slow down the startup of every session
+        import hashlib
+
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.bit_count for i in range(self.hash_count))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _merge_bits(bloom_filter, bits):
+    """OR the bits of a filter of the same size into bloom_filter."""
+    merged = int.from_bytes(bloom_filter.bits, 'little') | int.from_bytes(bits, 'little')
+    bloom_filter.bits[:] = merged.to_bytes(len(bits), 'little')
+
+
+class SeenRecipes:
+    """
+    Persistent record of the recipe URIs a household has already been shown.
+
+    The URIs are kept in two Bloom filter generations of capacity recipes each. When the
+    current generation is full it becomes the previous one and a new generation starts,
+    so the oldest recipes are slowly forgotten instead of the false positive rate growing
+    without bound. The filters are written to disk after every change, a few kilobytes.
+
+    Several processes can record recipes in the same file (e.g. the menu and the service
+    of one household). Every change is made under the file lock on top of the filters on
+    disk (see _merge()), and the file holds the number of the current generation, so
+    filters of different generations are never mixed up.
+
+    stats counts the page requests of the no-repeat fetch path (see recipes) that were
+    sent to Edamam and how many of them were wasted, i.e. held no recipe that was not
+    shown before.
+    """
+
+    def __init__(self, file_path, capacity=SEEN_RECIPES_CAPACITY, error_rate=SEEN_RECIPES_ERROR_RATE):
+        self.file_path = file_path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.stats = {'shown': 0, 'repeats_shown': 0, 'repeats_skipped': 0, 'page_requests': 0, 'wasted_requests': 0}
+        self._current = None
+        self._previous = None
+        self._counts = [0, 0]  # Items in the current and in the previous generation
+        self._generation = 0  # Number of rotations so far
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Read the filters from disk on first use. Lock must be held."""
+        if self._current is not None:
+            return
+        self._current = BloomFilter.for_capacity(self.capacity, self.error_rate)
+        self._previous = BloomFilter(self._current.bit_count, self._current.hash_count)
+        stored = self._read_file()
+        if stored is not None:
+            self._generation, current_bits, previous_bits, self._counts = stored
+            self._current.bits[:] = current_bits
+            self._previous.bits[:] = previous_bits
+
+    def _read_file(self):
+        """
+        Return (generation, current bits, previous bits, [current count, previous count]) as stored on disk.
+
+        Returns None when there is no file, or when it was written with other settings or
+        is damaged (the filters then start over).
+        """
+        if not os.path.exists(self.file_path):
+            return None
+        with open(self.file_path, 'rb') as file:
+            data = file.read()
+        size = len(self._current.bits)
+        if len(data) != HEADER.size + 2 * size:
+            return None
+        magic, bit_count, hash_count, generation, current_count, previous_count = HEADER.unpack_from(data)
+        if magic != MAGIC or (bit_count, hash_count) != (self._current.bit_count, self._current.hash_count):
+            return None
+        return (generation, data[HEADER.size:HEADER.size + size], data[HEADER.size + size:],
+                [current_count, previous_count])
+
+    def _merge(self, stored):
+        """
+        Bring the filters in memory up to date with the filters on disk. Lock and file lock must be held.
+
+        Filters of the same generation are OR-ed together. When another process rotated
+        once more than this one, its current generation is new and the previous one
+        matches ours; when it is even further ahead our filters are simply too old.
+        """
+        if stored is None:
+            return
+        generation, current_bits, previous_bits, counts = stored
+        if generation == self._generation:
+            _merge_bits(self._current, current_bits)
+            _merge_bits(self._previous, previous_bits)
+            self._counts = [max(count, stored_count) for count, stored_count in zip(self._counts, counts)]
+        elif generation == self._generation + 1:
+            self._previous = self._current
+            _merge_bits(self._previous, previous_bits)
+            self._current = BloomFilter(self._previous.bit_count, self._previous.hash_count, current_bits)
+            self._counts = [counts[0], max(self._counts[0], counts[1])]
+            self._generation = generation
+        elif generation > self._generation:
+            self._current.bits[:] = current_bits
+            self._previous.bits[:] = previous_bits
+            self._counts = counts
+            self._generation = generation
+        elif generation == self._generation - 1:
+            # Written by a process that did not see our rotation yet: its current generation is our previous one
+            _merge_bits(self._previous, current_bits)
+
+    def _save(self):
+        """Write the filters to disk (atomically). Lock and file lock must be held."""
+        header = HEADER.pack(MAGIC, self._current.bit_count, self._current.hash_count, self._generation, *self._counts)
+        write_file_atomic(self.file_path, header + self._current.bits + self._previous.bits)
+
+    def __contains__(self, uri):
+        with self._lock:
+            self._load()
+            return uri in self._current or uri in self._previous
+
+    def add(self, uri):
+        """Record a recipe as shown."""
+        with self._lock:
+            self._load()
+            folder = os.path.dirname(self.file_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            with file_lock(self.file_path):
+                self._merge(self._read_file())
+                if uri in self._current:
+                    return
+                if self._counts[0] >= self.capacity:
+                    self._previous = self._current
+                    self._current = BloomFilter(self._previous.bit_count, self._previous.hash_count)
+                    self._counts = [0, self._counts[0]]
+                    self._generation += 1
+                self._current.add(uri)
+                self._counts[0] += 1
+                self._save()
+
+    def record_page(self, wasted):
+        """Count a page of the no-repeat fetch path that was requested from Edamam."""
+        with self._lock:
+            self.stats['page_requests'] += 1
+            if wasted:
+                self.stats['wasted_requests'] += 1
+        if metrics.enabled:
+            metrics.increment('recipe_page_requests_total', wasted=wasted)
+
+    def record_shown(self, repeat, skipped=0):
+        """Count a recipe that was shown, whether it was a repeat and how many seen recipes were skipped for it."""
+        with self._lock:
+            self.stats['shown'] += 1
+            self.stats['repeats_skipped'] += skipped
+            if repeat:
+                self.stats['repeats_shown'] += 1
+
+    def get_stats(self):
+        """Return the counters together with the wasted request rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        requests = stats['page_requests']
+        stats['wasted_request_rate'] = stats['wasted_requests'] / requests if requests else 0.0
+        return stats
+
+
+# Recipes shown to the household of the files configured in .env
+seen_recipes = SeenRecipes(SEEN_RECIPES_FILE)
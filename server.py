@@ -0,0 +1,299 @@
+import os
+import re
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from config import config, DATA_FOLDER
+from commands import Household, execute_command
+from helper_functions import check_or_create_file
+from metrics import metrics
+from offline import set_offline
+from product_repository import ProductRepository
+from seen_recipes import SeenRecipes
+from recipe_prefetch import start_prefetch
+from recipes import RANDOM_RECIPE_CATEGORIES
+from request_scheduler import get_scheduler_stats
+
+# Every household gets its own fridge and shopping list in <HOUSEHOLDS_FOLDER>/<household>/
+HOUSEHOLDS_FOLDER = config.get("HOUSEHOLDS_FOLDER", os.path.join(DATA_FOLDER, "households"))
+SERVICE_HOST = config.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = config.get_int("SERVICE_PORT", 8080)
+SERVICE_WORKERS = config.get_int("SERVICE_WORKERS", 16)
+
+# Household ids are used as folder names
+HOUSEHOLD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class HouseholdRegistry:
+    """
+    Creates and keeps the Household of every household id.
+
+    A household is created on its first request and stays in memory, so its product
+    lists are parsed once and every later request works on the warm in-memory view.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._households = {}
+        self._lock = threading.Lock()
+
+    def get(self, household_id):
+        """Return the household with the given id, creating its files on first use."""
+        if not HOUSEHOLD_ID_PATTERN.match(household_id):
+            raise ValueError(f"Ongeldige huishouden id '{household_id}'.")
+
+        with self._lock:
+            household = self._households.get(household_id)
+            if household is None:
+                household_folder = os.path.join(self.folder, household_id)
+                fridge_file = os.path.join(household_folder, 'fridge.csv')
+                shopping_list_file = os.path.join(household_folder, 'shopping_list.csv')
+                check_or_create_file(fridge_file)
+                check_or_create_file(shopping_list_file)
+                household = Household(ProductRepository(fridge_file, lowercase_names=True),
+                                      ProductRepository(shopping_list_file),
+                                      SeenRecipes(os.path.join(household_folder, 'seen_recipes.bin')))
+                self._households[household_id] = household
+        return household
+
+    def count(self):
+        with self._lock:
+            return len(self._households)
+
+
+#------------------------------------------
+# Routes
+#------------------------------------------
+
+def get_query_value(query, name, default=None):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def get_positive_int_query_value(query, name, default):
+    """Return a query parameter as a positive integer. Raises ValueError (shown to the client) for other values."""
+    value = get_query_value(query, name)
+    if value is None:
+        return default
+    if not value.strip().isdecimal() or int(value) < 1:
+        raise ValueError(f"'{name}' moet een positief geheel getal zijn.")
+    return int(value)
+
+
+def build_product_list_routes(list_name):
+    """Return the route functions for the list and add/remove/clear endpoints of a product list."""
+    def list_products(body, query, product=None):
+        return {'op': f'{list_name}.list'}
+
+    def add_products(body, query, product=None):
+        return dict(body, op=f'{list_name}.add')
+
+    def remove_products(body, query, product=None):
+        if product is not None:
+            return {'op': f'{list_name}.remove', 'products': [product]}
+        return dict(body, op=f'{list_name}.clear') if body.get('clear') else dict(body, op=f'{list_name}.remove')
+
+    return list_products, add_products, remove_products
+
+
+list_fridge, add_to_fridge, remove_from_fridge = build_product_list_routes('fridge')
+list_shopping_list, add_to_shopping_list, remove_from_shopping_list = build_product_list_routes('shopping_list')
+
+
+# (method, path pattern) -> function(body, query, *path arguments) that returns the command to execute
+ROUTES = [
+    ('GET', re.compile(r'^/households/([^/]+)/fridge$'), list_fridge),
+    ('POST', re.compile(r'^/households/([^/]+)/fridge$'), add_to_fridge),
+    ('DELETE', re.compile(r'^/households/([^/]+)/fridge$'), remove_from_fridge),
+    ('DELETE', re.compile(r'^/households/([^/]+)/fridge/([^/]+)$'), remove_from_fridge),
+    ('GET', re.compile(r'^/households/([^/]+)/shopping-list$'), list_shopping_list),
+    ('POST', re.compile(r'^/households/([^/]+)/shopping-list$'), add_to_shopping_list),
+    ('DELETE', re.compile(r'^/households/([^/]+)/shopping-list$'), remove_from_shopping_list),
+    ('DELETE', re.compile(r'^/households/([^/]+)/shopping-list/([^/]+)$'), remove_from_shopping_list),
+    ('POST', re.compile(r'^/households/([^/]+)/shopping-list/recipe-ingredients$'),
+     lambda body, query: dict(body, op='shopping_list.add_recipe_ingredients')),
+    ('POST', re.compile(r'^/households/([^/]+)/shopping-list/remove-fridge-products$'),
+     lambda body, query: {'op': 'shopping_list.remove_fridge_products'}),
+    ('GET', re.compile(r'^/households/([^/]+)/recipes/random$'),
+     lambda body, query: {'op': 'recipe.random', 'category': get_query_value(query, 'category')}),
+    ('GET', re.compile(r'^/households/([^/]+)/recipes/weather$'),
+     lambda body, query: {'op': 'recipe.weather', 'city': get_query_value(query, 'city')}),
+    ('GET', re.compile(r'^/households/([^/]+)/recipes/seen-stats$'),
+     lambda body, query: {'op': 'recipe.seen_stats'}),
+    ('POST', re.compile(r'^/households/([^/]+)/meal-plan$'),
+     lambda body, query: dict(body, op='meal_plan.create')),
+    ('GET', re.compile(r'^/households/([^/]+)/recipes/fridge$'),
+     lambda body, query: {'op': 'recipe.fridge', 'top_k': get_positive_int_query_value(query, 'top_k', 5)}),
+]
+
+# POST /households/<id>/commands takes a single command or a list of commands (see commands)
+COMMANDS_ROUTE = re.compile(r'^/households/([^/]+)/commands$')
+
+
+class FridgeChefRequestHandler(BaseHTTPRequestHandler):
+    """Maps the HTTP endpoints on the commands of the household in the path."""
+
+    server_version = "FridgeChef"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without this every response waits for a delayed ACK
+    disable_nagle_algorithm = True
+    # Idle keep-alive connections give their worker back after this many seconds
+    timeout = 15
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def handle_request(self, method):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            body = self.read_body()
+        except ValueError as e:
+            self.send_json(400, {'ok': False, 'error': f"Ongeldige JSON: {e}"})
+            return
+
+        if method == 'GET' and url.path == '/health':
+            self.send_json(200, {'ok': True, 'households': self.server.households.count(),
+                                 'edamam': get_scheduler_stats()})
+            return
+
+        if method == 'GET' and url.path == '/metrics':
+            self.send_text(200, metrics.to_prometheus(), 'text/plain; version=0.0.4')
+            return
+
+        match = COMMANDS_ROUTE.match(url.path)
+        if method == 'POST' and match:
+            commands = body if isinstance(body, list) else [body]
+            results = self.execute(unquote(match.group(1)), commands)
+            if results is not None:
+                self.send_json(200, results if isinstance(body, list) else results[0])
+            return
+
+        for route_method, pattern, build_command in ROUTES:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                household_id, *arguments = [unquote(group) for group in match.groups()]
+                if not isinstance(body, dict):
+                    self.send_json(400, {'ok': False, 'error': "Verwacht een JSON object."})
+                    return
+                try:
+                    command = build_command(body, query, *arguments)
+                except ValueError as e:
+                    self.send_json(400, {'ok': False, 'error': str(e)})
+                    return
+                results = self.execute(household_id, [command])
+                if results is not None:
+                    self.send_json(200 if results[0]['ok'] else 400, results[0])
+                return
+
+        self.send_json(404, {'ok': False, 'error': f"Onbekend endpoint {method} {url.path}."})
+
+    def execute(self, household_id, commands):
+        """Execute commands for a household, one request of a household at a time. Returns None on an error response."""
+        try:
+            household = self.server.households.get(household_id)
+        except ValueError as e:
+            self.send_json(400, {'ok': False, 'error': str(e)})
+            return None
+
+        with household.lock:
+            return [execute_command(command, household) for command in commands]
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def send_json(self, status, data):
+        self.send_text(status, json.dumps(data, ensure_ascii=False), 'application/json')
+
+    def send_text(self, status, text, content_type):
+        payload = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FridgeChefServer(HTTPServer):
+    """
+    HTTP server that handles every connection on a fixed pool of worker threads.
+
+    All requests share the module-level API clients and caches (http_client session,
+    recipe_cache, recipe_index, weather cache), only the product lists are per household.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, address, households, workers=SERVICE_WORKERS, verbose=False):
+        super().__init__(address, FridgeChefRequestHandler)
+        self.households = households
+        self.verbose = verbose
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fridgechef-worker')
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+
+
+def create_server(host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS, households_folder=HOUSEHOLDS_FOLDER,
+                  verbose=False):
+    """Create the FridgeChef service. Call serve_forever() on the result to start handling requests."""
+    return FridgeChefServer((host, port), HouseholdRegistry(households_folder), workers, verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FridgeChef HTTP service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Number of worker threads")
+    parser.add_argument("--no-prefetch", action="store_true", help="Do not fill the random recipe buffers in the background")
+    parser.add_argument("--offline", action="store_true",
+                        help="Serve recipes and weather from local data only, without using the network")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    arguments = parser.parse_args()
+
+    if arguments.offline:
+        set_offline(True)
+    if not arguments.no_prefetch and not arguments.offline:
+        start_prefetch(RANDOM_RECIPE_CATEGORIES)
+
+    server = create_server(arguments.host, arguments.port, arguments.workers, verbose=arguments.verbose)
+    print(f"FridgeChef service luistert op http://{arguments.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
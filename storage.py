@@ -0,0 +1,149 @@
+import io
+import os
+import csv
+import time
+import tempfile
+from contextlib import contextmanager
+
+from metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl, writers are not serialized between processes there
+    fcntl = None
+
+
+#------------------------------------------
+# Locking
+#------------------------------------------
+
+@contextmanager
+def file_lock(file_path):
+    """
+    Hold an exclusive advisory lock for file_path while the block runs.
+
+    The lock is taken on a separate '<file>.lock' file, because the data file itself is
+    replaced on every rewrite. Only writers lock, readers never wait.
+    """
+    with open(f"{file_path}.lock", mode='a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+#------------------------------------------
+# Reading and writing files
+#------------------------------------------
+
+def get_file_signature(file_path):
+    """Return the (inode, mtime, size) triple that identifies the current version of a file."""
+    stat = os.stat(file_path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def read_rows(file_path):
+    """
+    Read a CSV file and return (header, rows) without taking a lock.
+
+    Writers always replace the whole file atomically or append complete rows, so a
+    reader sees a consistent snapshot.
+    """
+    start = time.perf_counter() if metrics.enabled else None
+    with open(file_path, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        rows = [row for row in reader if row]
+        if start is not None:
+            record_file_operation('read', file_path, start, len(rows), os.fstat(file.fileno()).st_size)
+    return header, rows
+
+
+def write_rows_atomic(file_path, header, rows):
+    """
+    Replace a CSV file with the given header and rows in one atomic step.
+
+    The rows are written to a temporary file in the same folder and flushed to disk with
+    fsync before the temporary file is renamed over the original. A crash therefore
+    leaves either the old or the new file, never a truncated one.
+    """
+    start = time.perf_counter() if metrics.enabled else None
+    if start is not None:
+        rows = list(rows)
+    folder = os.path.dirname(os.path.abspath(file_path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=folder, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            if header is not None:
+                writer.writerow(header)
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+            size = file.tell()
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    _fsync_folder(folder)
+    if start is not None:
+        record_file_operation('write', file_path, start, len(rows), size)
+
+
+def write_file_atomic(file_path, data):
+    """Replace a file with the given bytes in one atomic step, the same way as write_rows_atomic()."""
+    start = time.perf_counter() if metrics.enabled else None
+    folder = os.path.dirname(os.path.abspath(file_path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=folder, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, mode='wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    _fsync_folder(folder)
+    if start is not None:
+        record_file_operation('write', file_path, start, 0, len(data))
+
+
+def append_rows(file_path, rows, encoding=None):
+    """Append rows to a CSV file with a single write and flush them to disk."""
+    start = time.perf_counter() if metrics.enabled else None
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    with open(file_path, mode='a', newline='', encoding=encoding) as file:
+        offset = file.tell() if start is not None else 0
+        file.write(buffer.getvalue())
+        file.flush()
+        os.fsync(file.fileno())
+        if start is not None:
+            record_file_operation('append', file_path, start, len(rows), file.tell() - offset)
+
+
+def record_file_operation(operation, file_path, start, rows, size):
+    """Record the duration, number of rows and bytes of a file operation."""
+    labels = {'file': os.path.basename(file_path), 'operation': operation}
+    metrics.observe('file_operation_seconds', time.perf_counter() - start, **labels)
+    metrics.increment('file_rows_total', rows, **labels)
+    metrics.increment('file_bytes_total', size, **labels)
+
+
+def _fsync_folder(folder):
+    """Make a rename durable by syncing the folder (not supported on every platform)."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    folder_descriptor = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(folder_descriptor)
+    finally:
+        os.close(folder_descriptor)
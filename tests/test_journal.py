@@ -0,0 +1,79 @@
+from ingredient_matching import normalize_ingredient
+from journal import ADD, REMOVE, CLEAR, get_journal_path, append_records, read_records, apply_records
+from product_repository import ProductRepository
+from storage import read_rows, write_rows_atomic
+
+
+def make_list(tmp_path, products=()):
+    file_path = str(tmp_path / 'fridge.csv')
+    write_rows_atomic(file_path, ['product_name'], [[product] for product in products])
+    return file_path
+
+
+def test_replay_applies_the_records_in_order(tmp_path):
+    journal_path = str(tmp_path / 'fridge.csv.journal')
+    append_records(journal_path, [(ADD, 'Eggs'), (ADD, 'milk'), (REMOVE, 'egg'), (ADD, 'Tomatoes')])
+    append_records(journal_path, [(CLEAR, ''), (ADD, 'butter')])
+
+    records, offset = read_records(journal_path)
+    products = {}
+    apply_records(products, records, normalize_ingredient)
+
+    assert len(records) == 6
+    assert products == {'butter': 'butter'}
+    assert read_records(journal_path, offset) == ([], offset)
+
+
+def test_read_records_leaves_an_incomplete_line_for_the_next_call(tmp_path):
+    journal_path = str(tmp_path / 'fridge.csv.journal')
+    append_records(journal_path, [(ADD, 'milk')])
+    with open(journal_path, mode='a') as file:
+        file.write('+,chee')
+
+    records, offset = read_records(journal_path)
+    assert records == [(ADD, 'milk')]
+
+    with open(journal_path, mode='a') as file:
+        file.write('se\r\n')
+    assert read_records(journal_path, offset)[0] == [(ADD, 'cheese')]
+
+
+def test_replaying_a_compacted_journal_changes_nothing():
+    records = [(ADD, 'milk'), (ADD, 'Eggs'), (REMOVE, 'milk'), (ADD, 'rice')]
+    products = {}
+    apply_records(products, records, normalize_ingredient)
+    compacted = dict(products)
+
+    # The snapshot already contains the journal when a compaction is interrupted before the truncate
+    apply_records(products, records, normalize_ingredient)
+    assert products == compacted == {'egg': 'Eggs', 'rice': 'rice'}
+
+
+def test_interrupted_compaction_gives_the_same_list(tmp_path):
+    file_path = make_list(tmp_path, ['cheese'])
+    repository = ProductRepository(file_path)
+    repository.add_many(['milk', 'Eggs'])
+    repository.remove('cheese')
+
+    # Snapshot written, but the journal was never truncated
+    write_rows_atomic(file_path, ['product_name'], [[product] for product in repository.get_products()])
+
+    assert ProductRepository(file_path).get_products() == ['milk', 'Eggs']
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    file_path = make_list(tmp_path, ['cheese'])
+    repository = ProductRepository(file_path, compact_threshold=3)
+    other = ProductRepository(file_path)
+    assert other.get_products() == ['cheese']
+
+    repository.add_many(['milk', 'eggs'])
+    repository.remove('cheese')
+
+    assert read_rows(file_path) == (['product_name'], [['milk'], ['eggs']])
+    assert read_records(get_journal_path(file_path)) == ([], 0)
+    # A second compaction of the same list writes the same snapshot
+    repository.compact()
+    assert read_rows(file_path) == (['product_name'], [['milk'], ['eggs']])
+    # Another repository that had read the old snapshot notices the compaction
+    assert other.get_products() == ['milk', 'eggs']
@@ -0,0 +1,52 @@
+from meal_planner import plan_meals
+
+
+def make_recipe(label, foods):
+    return {'uri': f"recipe#{label}", 'label': label, 'ingredients': [{'food': food} for food in foods]}
+
+
+def get_labels(plan):
+    return [recipe['label'] for recipe, _ in plan.meals]
+
+
+def test_plan_needs_as_few_extra_ingredients_as_possible():
+    recipes = [
+        make_recipe('Paella', ['chicken', 'rice', 'saffron']),
+        make_recipe('Tomato salad', ['tomato', 'basil']),
+        make_recipe('Caprese', ['tomato', 'basil', 'mozzarella']),
+        make_recipe('Pancakes', ['eggs', 'milk']),
+    ]
+    plan = plan_meals(recipes, ['Eggs', 'milk', 'Tomatoes'], meal_count=2)
+
+    assert get_labels(plan) == ['Pancakes', 'Tomato salad']
+    assert [missing for _, missing in plan.meals] == [[], ['basil']]
+    assert plan.missing_ingredients == ['basil']
+    assert plan.fridge_used == ['Eggs', 'milk', 'Tomatoes']
+    assert plan.candidate_count == 4
+
+
+def test_ingredients_are_named_as_in_the_recipes_and_the_fridge():
+    recipes = [
+        make_recipe('Ratatouille', ['eggplant', 'Courgettes']),
+        make_recipe('Stir fry', ['aubergine', 'zucchini', 'Garlic']),
+    ]
+    plan = plan_meals(recipes, ['Aubergines '], meal_count=2)
+
+    assert get_labels(plan) == ['Ratatouille', 'Stir fry']
+    # Every meal uses its own names, the plan those of the first chosen recipe that needs the food
+    assert [missing for _, missing in plan.meals] == [['Courgettes'], ['Garlic', 'zucchini']]
+    assert plan.missing_ingredients == ['Courgettes', 'Garlic']
+    assert plan.fridge_used == ['Aubergines']
+
+
+def test_repeated_and_empty_recipes_are_no_candidates():
+    recipes = [
+        make_recipe('Omelette', ['eggs']),
+        make_recipe('Omelette', ['eggs']),
+        make_recipe('Water', []),
+    ]
+    plan = plan_meals(recipes, ['egg'], meal_count=3)
+
+    assert plan.candidate_count == 1
+    assert plan.to_dict()['meals'] == [{'label': 'Omelette', 'uri': 'recipe#Omelette', 'missing': []}]
+    assert plan.fridge_used == ['egg']
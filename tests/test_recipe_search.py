@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from recipe_search import RecipeSearchIndex
+
+
+def write_recipe(folder, number, label, ingredients, meal_type='lunch/dinner', calories=500):
+    file_path = os.path.join(folder, f"{number} - {label}.txt")
+    with open(file_path, 'w') as file:
+        file.write(
+            f"Recept: {label}\n"
+            f"Maaltijdtype: {meal_type}\n"
+            "Ingrediënten:\n" + ''.join(f"  - {line}\n" for line in ingredients) +
+            f"\nCalorieën: {calories:.2f}\n"
+        )
+    return file_path
+
+
+@pytest.fixture
+def index(tmp_path):
+    folder = tmp_path / 'recipes'
+    folder.mkdir()
+    write_recipe(str(folder), 1, 'Chicken curry', ['500 g chicken', '1 onion'], calories=650)
+    write_recipe(str(folder), 2, 'Tomato soup', ['4 tomatoes', '1 onion'], calories=250)
+    write_recipe(str(folder), 3, 'Pancakes', ['2 eggs', '250 ml milk'], meal_type='breakfast', calories=400)
+    return RecipeSearchIndex(str(folder), str(tmp_path / 'data' / 'index.json'))
+
+
+def get_labels(documents):
+    return [document['label'] for document in documents]
+
+
+def test_terms_facets_and_calories(index):
+    assert get_labels(index.search('onion')) == ['Chicken curry', 'Tomato soup']
+    assert get_labels(index.search('onion AND calories < 600')) == ['Tomato soup']
+    assert get_labels(index.search('meal:breakfast OR chicken')) == ['Chicken curry', 'Pancakes']
+    assert get_labels(index.search('onion (tomato OR egg)')) == ['Tomato soup']
+
+
+@pytest.mark.parametrize('query', ['', '   '])
+def test_empty_query_finds_nothing(index, query):
+    assert index.search(query) == []
+
+
+@pytest.mark.parametrize('query', ['(chicken', 'chicken)', '((onion OR egg)', 'onion AND (tomato'])
+def test_unbalanced_parentheses_are_rejected(index, query):
+    with pytest.raises(ValueError):
+        index.search(query)
+
+
+def test_not_only_query(index):
+    assert get_labels(index.search('NOT onion')) == ['Pancakes']
+    assert get_labels(index.search('NOT NOT onion')) == ['Chicken curry', 'Tomato soup']
+    with pytest.raises(ValueError):
+        index.search('NOT')
+
+
+def test_file_edited_in_place_is_indexed_again(index):
+    assert get_labels(index.search('rice')) == []
+    folder_stat = os.stat(index.recipe_folder)
+    file_path = write_recipe(index.recipe_folder, 2, 'Tomato soup', ['4 tomatoes', '100 g rice'], calories=300)
+    file_stat = os.stat(file_path)
+    # Make sure the mtime changed, and that only the file changed and not the folder
+    os.utime(file_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 1_000_000))
+    os.utime(index.recipe_folder, ns=(folder_stat.st_atime_ns, folder_stat.st_mtime_ns))
+
+    # Only the folder is checked until a save is reported (or the files are checked again)
+    assert get_labels(index.search('rice')) == []
+    index.invalidate()
+    assert get_labels(index.search('rice')) == ['Tomato soup']
+    assert get_labels(index.search('onion')) == ['Chicken curry']
+
+
+def test_only_full_refresh_checks_every_file(index):
+    index.refresh()
+    folder_stat = os.stat(index.recipe_folder)
+    file_path = write_recipe(index.recipe_folder, 1, 'Chicken curry', ['500 g chicken', '2 leeks'], calories=650)
+    file_stat = os.stat(file_path)
+    os.utime(file_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 1_000_000))
+    os.utime(index.recipe_folder, ns=(folder_stat.st_atime_ns, folder_stat.st_mtime_ns))
+
+    assert index.refresh() == 0
+    assert index.refresh(full=True) == 1
+    assert get_labels(index.search('leek')) == ['Chicken curry']
+
+
+@pytest.mark.parametrize('query', ['meal:', 'meal:  AND chicken', 'cuisine:-'])
+def test_facet_without_value_is_rejected(index, query):
+    with pytest.raises(ValueError):
+        index.search(query)
+
+
+def test_removed_file_and_stored_index(index):
+    index.refresh()
+    os.remove(os.path.join(index.recipe_folder, '3 - Pancakes.txt'))
+    assert index.refresh() == 1
+
+    reloaded = RecipeSearchIndex(index.recipe_folder, index.index_file)
+    assert reloaded.refresh() == 0
+    assert get_labels(reloaded.search('NOT chicken')) == ['Tomato soup']
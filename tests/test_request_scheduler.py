@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from http_client import RequestError
+from request_scheduler import RequestScheduler, INTERACTIVE, PREFETCH
+
+
+@pytest.fixture
+def blocked_scheduler():
+    """A scheduler with one worker that is busy until release is set, so new requests stay queued."""
+    scheduler = RequestScheduler('test', 0, 1, max_concurrent=1)
+    started = threading.Event()
+    release = threading.Event()
+    busy = scheduler.schedule('busy', lambda: started.set() or release.wait(5))
+    started.wait(5)
+    yield scheduler, release
+    release.set()
+    busy.result(5)
+
+
+def test_cancel_drops_a_queued_request(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    calls = []
+    future = scheduler.schedule('page', lambda: calls.append('page'), PREFETCH)
+
+    assert scheduler.cancel(future)
+    assert future.cancelled()
+    release.set()
+    assert scheduler.submit('next', lambda: 'done') == 'done'
+    assert calls == []
+    assert scheduler.get_stats()['cancelled'] == 1
+
+
+def test_cancel_keeps_a_request_that_another_caller_waits_for(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    future = scheduler.schedule('page', lambda: 'page', PREFETCH)
+    shared = scheduler.schedule('page', lambda: 'other', INTERACTIVE)
+
+    assert shared is future
+    assert not scheduler.cancel(future)
+    release.set()
+    assert future.result(5) == 'page'
+
+
+def test_timed_out_caller_is_dropped(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    calls = []
+    shared = scheduler.schedule('page', lambda: calls.append('page') or 'page', PREFETCH)
+
+    with pytest.raises(RequestError):
+        scheduler.submit('page', lambda: 'other', timeout=0.05)
+    assert not shared.cancelled()
+    with pytest.raises(RequestError):
+        scheduler.submit('alone', lambda: calls.append('alone'), timeout=0.05)
+
+    release.set()
+    assert shared.result(5) == 'page'
+    assert scheduler.submit('next', lambda: 'done') == 'done'
+    assert calls == ['page']
+    assert scheduler.get_stats()['timeouts'] == 2
+
+
+def test_cancel_after_the_request_was_sent():
+    scheduler = RequestScheduler('test', 0, 1)
+    future = scheduler.schedule('page', lambda: 'page')
+    assert future.result(5) == 'page'
+    assert not scheduler.cancel(future)
+
+
+def test_identical_requests_share_one_call(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    calls = []
+    first = scheduler.schedule('pasta', lambda: calls.append('first') or 'recipes')
+    second = scheduler.schedule('pasta', lambda: calls.append('second') or 'other recipes')
+
+    release.set()
+    assert first.result(5) == second.result(5) == 'recipes'
+    assert scheduler.submit('pasta', lambda: calls.append('third') or 'new recipes') == 'new recipes'
+    assert calls == ['first', 'third']
+    assert scheduler.get_stats()['coalesced'] == 1
+
+
+def test_interactive_requests_overtake_queued_prefetches(blocked_scheduler):
+    scheduler, release = blocked_scheduler
+    order = []
+    prefetches = [scheduler.schedule(f'prefetch {number}', lambda number=number: order.append(f'prefetch {number}'))
+                  for number in range(2)]
+    interactive = scheduler.schedule('interactive', lambda: order.append('interactive'), INTERACTIVE)
+    # Waiting for a queued prefetch moves it up as well
+    scheduler.promote(prefetches[1], INTERACTIVE)
+
+    release.set()
+    for future in prefetches + [interactive]:
+        future.result(5)
+    assert order == ['interactive', 'prefetch 1', 'prefetch 0']
+
+
+def test_prefetches_leave_tokens_for_interactive_requests():
+    # Ten tokens and hardly any refill: prefetches may take seven of them
+    scheduler = RequestScheduler('test', 0.01, 10, max_concurrent=10, interactive_reserve=0.3)
+    prefetches = [scheduler.schedule(f'prefetch {number}', lambda: 'page', PREFETCH) for number in range(10)]
+    for future in prefetches[:7]:
+        assert future.result(5) == 'page'
+    assert not any(future.done() for future in prefetches[7:])
+
+    assert scheduler.submit('interactive', lambda: 'recipe', INTERACTIVE, timeout=5) == 'recipe'
+    stats = scheduler.get_stats()
+    assert (stats['sent'], stats['queued'], stats['reserved_for_interactive']) == (8, 3, 3)
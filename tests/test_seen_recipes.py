@@ -0,0 +1,79 @@
+from seen_recipes import BloomFilter, SeenRecipes
+
+
+def get_false_positive_rate(seen, count=2000):
+    return sum(f'unseen {number}' in seen for number in range(count)) / count
+
+
+def test_bloom_filter_round_trip():
+    bloom_filter = BloomFilter.for_capacity(100, 0.01)
+    for number in range(100):
+        bloom_filter.add(f'recipe {number}')
+    copy = BloomFilter(bloom_filter.bit_count, bloom_filter.hash_count, bytes(bloom_filter.bits))
+
+    assert all(f'recipe {number}' in copy for number in range(100))
+    assert sum(f'other {number}' in copy for number in range(2000)) / 2000 < 0.03
+
+
+def test_filters_survive_a_reload(tmp_path):
+    file_path = str(tmp_path / 'seen.bin')
+    seen = SeenRecipes(file_path, capacity=50)
+    for number in range(30):
+        seen.add(f'recipe {number}')
+
+    reloaded = SeenRecipes(file_path, capacity=50)
+    assert all(f'recipe {number}' in reloaded for number in range(30))
+    assert 'recipe 30' not in reloaded
+
+
+def test_old_recipes_age_out_past_capacity(tmp_path):
+    file_path = str(tmp_path / 'seen.bin')
+    seen = SeenRecipes(file_path, capacity=50, error_rate=0.01)
+    for number in range(250):
+        seen.add(f'recipe {number}')
+
+    # About 200-249 are in the current generation and 150-199 in the previous one (false
+    # positives are not added, which moves the boundaries a little)
+    assert seen._generation == 4
+    assert seen._counts[0] <= 50 and seen._counts[1] == 50
+    assert sum(f'recipe {number}' in seen for number in range(100)) <= 5
+    assert all(f'recipe {number}' in seen for number in range(160, 250))
+    assert get_false_positive_rate(seen) < 0.05
+
+    reloaded = SeenRecipes(file_path, capacity=50, error_rate=0.01)
+    assert get_false_positive_rate(reloaded) < 0.05
+
+
+def test_two_instances_sharing_a_file(tmp_path):
+    file_path = str(tmp_path / 'seen.bin')
+    first = SeenRecipes(file_path, capacity=50)
+    second = SeenRecipes(file_path, capacity=50)
+    first.add('first recipe')
+    second.add('second recipe')
+    first.add('third recipe')
+
+    combined = SeenRecipes(file_path, capacity=50)
+    assert all(uri in combined for uri in ('first recipe', 'second recipe', 'third recipe'))
+    assert combined._counts == [3, 0]
+
+
+def test_rotation_by_one_instance_is_picked_up_by_the_other(tmp_path):
+    file_path = str(tmp_path / 'seen.bin')
+    first = SeenRecipes(file_path, capacity=50)
+    second = SeenRecipes(file_path, capacity=50)
+    second.add('old recipe')
+    for number in range(60):
+        first.add(f'recipe {number}')
+
+    # second still has generation 0 in memory, its next change follows the rotation of first
+    second.add('new recipe')
+    assert second._generation == 1
+    assert second._counts[0] <= 12 and second._counts[1] == 50
+    assert 'old recipe' in second and 'recipe 0' in second and 'recipe 59' in second
+
+    for number in range(60, 200):
+        (first if number % 2 else second).add(f'recipe {number}')
+    combined = SeenRecipes(file_path, capacity=50)
+    assert combined._counts[0] <= 50
+    assert 'old recipe' not in combined
+    assert get_false_positive_rate(combined) < 0.05